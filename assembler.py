@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+from pipeline.packed_program import PackedProgram, assemble, disassemble
+from tracing.trace_reader import scan_cycles
+
+
+def readInstructions(INPUT):
+    '''
+    Yields the instructions of an input.json one at a time, the list is never held in memory
+    '''
+    for pc, (_, _, inst_str) in enumerate(scan_cycles(INPUT)): # Any JSON list, not only traces
+        if type(inst_str) != str:
+            raise ValueError(f"Instructions must be strings (PC={pc})")
+        yield inst_str
+
+
+def toPacked(INPUT, OUTPUT):
+    '''
+    Assembles an input.json into the packed binary program format
+    '''
+    try:
+        return assemble(readInstructions(INPUT), OUTPUT)
+    except Exception:
+        os.remove(OUTPUT) # No partial program left behind
+        raise
+
+
+def toJson(INPUT, OUTPUT):
+    '''
+    Disassembles a packed program back to an input.json
+    '''
+    with PackedProgram(INPUT) as program, open(OUTPUT, "w") as f:
+        f.write("[")
+        for pc, record in enumerate(program.records()):
+            f.write(",\n  " if pc else "\n  ")
+            f.write(json.dumps(disassemble(record)))
+        f.write("\n]" if len(program) else "]")
+        return len(program)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Converts programs between input.json and the packed binary program format read by src/simulator.py.")
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--disassemble", "-d", action="store_true", help="Packed program to input.json.")
+    args = parser.parse_args()
+
+    if args.disassemble:
+        print(f"{toJson(args.input, args.output)} instructions written")
+    else:
+        print(f"{toPacked(args.input, args.output)} instructions assembled")
+
+
+if __name__ == "__main__":
+    main()
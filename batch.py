@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+import functional
+from compare import compareTraces, RED, GREEN, RESET
+from pipeline.config import MachineConfig
+from pipeline.stage0 import decode_program
+from pipeline.state import ProcessorState
+from result_cache import DEFAULT_DIRECTORY, ResultCache, run_options
+from simulator import simulate
+from tracing.trace_writer import TraceWriter
+
+
+def discover(directories):
+    """
+    Returns the test folders (containing an input.json) under the given directories
+    """
+    tests = []
+    for directory in directories:
+        for test in sorted(glob.glob(os.path.join(directory, "*"))):
+            if os.path.isfile(os.path.join(test, "input.json")):
+                tests.append(test)
+    return tests
+
+
+def run_test(test, config, check_functional=False, cache=None, engine="scalar"):
+    """
+    Simulates one test into its user_output.json and compares it with its output.json
+    engine is scalar (the stage functions) or kernel (the compiled cycle loop, see kernel.py)
+    With check_functional, the final architectural state is also checked against the functional mode
+    With a cache (ResultCache), the trace of an identical earlier run is reused
+    Runs inside a worker process, the simulator is only imported once per worker.
+    @return (test, status, message, simulation seconds, comparison seconds)
+    """
+    output = os.path.join(test, "user_output.json")
+
+    start = time.perf_counter()
+    try:
+        with open(os.path.join(test, "input.json")) as f:
+            text = f.read()
+        program = decode_program(json.loads(text))
+
+        final = None
+        if cache is not None:
+            key = cache.trace_key(text, run_options(config, engine=engine))
+            final = cache.fetch_trace(key, output)
+
+        if final is None:
+            state = ProcessorState(config)
+            with TraceWriter(output) as trace:
+                raised = simulate(state, program, trace, engine)
+            final = (functional.architectural_state(state), raised, state.exception_pc if raised else 0)
+            if cache is not None:
+                cache.store_trace(key, output, final)
+    except Exception as e:
+        return test, "ERROR", f"{type(e).__name__}: {e}", time.perf_counter() - start, 0.0
+    simulation = time.perf_counter() - start
+
+    return check_test(test, program, final if check_functional else None, simulation, cache)
+
+
+def check_test(test, program, final, simulation, cache=None):
+    """
+    Compares the user_output.json of a simulated test with its output.json
+    final, if given, is the (registers, exception, exception PC) of the simulation to check against the functional mode
+    With a cache, the verdict of an earlier comparison of the same two traces is reused
+    @return (test, status, message, simulation seconds, comparison seconds)
+    """
+    output = os.path.join(test, "user_output.json")
+    reference = os.path.join(test, "output.json")
+    log = io.StringIO()
+
+    if final is not None:
+        if final != functional.run_functional(program):
+            return test, "FAILED", "Final architectural state differs from the functional mode", simulation, 0.0
+
+    if not os.path.isfile(reference):
+        return test, "NOREF", "", simulation, 0.0
+
+    start = time.perf_counter()
+    if cache is not None:
+        key = cache.verdict_key(output, reference)
+        verdict = cache.fetch_verdict(key)
+        if verdict is not None:
+            return (test, *verdict, simulation, time.perf_counter() - start)
+
+    with open(output) as f:
+        INPUT = json.load(f)
+    with open(reference) as f:
+        REFERENCE = json.load(f)
+    try:
+        with contextlib.redirect_stdout(log):
+            passed = compareTraces(INPUT, REFERENCE)
+    except SystemExit:
+        passed = False
+    comparison = time.perf_counter() - start
+
+    status = "PASSED" if passed else "FAILED"
+    message = "" if passed else log.getvalue().strip().splitlines()[-1]
+    if cache is not None:
+        cache.store_verdict(key, status, message)
+    return test, status, message, simulation, comparison
+
+
+def error(test, message):
+    """
+    Result of a test whose program could not be decoded
+    """
+    return test, "ERROR", message, 0.0, 0.0
+
+
+def run_lockstep(tests, config, batch_size, cache=None):
+    """
+    Simulates the tests with the NumPy batch engine, batch_size programs at a time
+    Yields (test, decoded program or None, final state, simulation seconds or error message)
+    """
+    from batch_engine import simulate_batch # Needs NumPy, only imported for --engine numpy
+
+    decoded = []
+    keys = {}
+    for test in tests:
+        try:
+            with open(os.path.join(test, "input.json")) as f:
+                text = f.read()
+            program = decode_program(json.loads(text))
+        except Exception as e:
+            yield test, None, None, f"{type(e).__name__}: {e}"
+            continue
+
+        if cache is not None:
+            keys[test] = cache.trace_key(text, run_options(config, engine="numpy"))
+            final = cache.fetch_trace(keys[test], os.path.join(test, "user_output.json"))
+            if final is not None:
+                yield test, program, final, 0.0
+                continue
+        decoded.append((test, program))
+
+    for first in range(0, len(decoded), batch_size):
+        chunk = decoded[first:first + batch_size]
+
+        start = time.perf_counter()
+        with contextlib.ExitStack() as stack:
+            traces = [stack.enter_context(TraceWriter(os.path.join(test, "user_output.json"))) for test, _ in chunk]
+            finals = simulate_batch([program for _, program in chunk], config, traces)
+        simulation = (time.perf_counter() - start) / len(chunk)
+
+        for (test, program), final in zip(chunk, finals):
+            if cache is not None:
+                cache.store_trace(keys[test], os.path.join(test, "user_output.json"), final)
+            yield test, program, final, simulation
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulates and compares every test of the given directories in a process pool")
+    parser.add_argument("directories", nargs="*", default=["given_tests"], help="Test directories (default: given_tests).")
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count(), help="Number of worker processes.")
+    parser.add_argument("--config", help="Machine parameters (JSON object).")
+    parser.add_argument("--functional-check", action="store_true", help="Also check the final registers against the functional mode.")
+    parser.add_argument("--engine", choices=("scalar", "kernel", "numpy"), default="scalar", help="Simulate each test in a worker with the stage functions (scalar) or the compiled cycle loop (kernel), or all of them in lockstep with NumPy (numpy).")
+    parser.add_argument("--batch-size", type=int, default=1024, help="Programs simulated together by the numpy engine.")
+    parser.add_argument("--no-cache", action="store_true", help="Always simulate and compare, without the result cache.")
+    parser.add_argument("--cache-dir", default=DEFAULT_DIRECTORY, help="The result cache directory (default: .simcache).")
+    parser.add_argument("--cache-size", type=int, default=256, help="Cache size limit in MB, the least recently used entries are removed.")
+    args = parser.parse_args()
+
+    try:
+        config = MachineConfig.from_json(args.config) if args.config else MachineConfig()
+    except (OSError, ValueError) as e:
+        parser.error(f"invalid --config: {e}")
+    tests = discover(args.directories)
+    if not tests:
+        print("No test found.")
+        return 1
+
+    cache = None if args.no_cache else ResultCache(args.cache_dir, args.cache_size << 20)
+
+    start = time.perf_counter()
+    counts = {}
+    failed = 0
+
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        if args.engine == "numpy":
+            futures = []
+            for test, program, final, simulation in run_lockstep(tests, config, args.batch_size, cache):
+                if program is None:
+                    futures.append(pool.submit(error, test, simulation))
+                else:
+                    futures.append(pool.submit(check_test, test, program, final if args.functional_check else None, simulation, cache))
+        else:
+            futures = [pool.submit(run_test, test, config, args.functional_check, cache, args.engine) for test in tests]
+        for future in futures:
+            test, status, message, simulation, comparison = future.result()
+            counts[status] = counts.get(status, 0) + 1
+            # A test without an output.json may expect its invalid program to be rejected, it never fails the run
+            if status == "FAILED" or status == "ERROR" and os.path.isfile(os.path.join(test, "output.json")):
+                failed += 1
+
+            color = GREEN if status == "PASSED" else RED if status in ("FAILED", "ERROR") else RESET
+            print(f"[{color}{status:6s}{RESET}] {test:20s} sim {simulation:7.3f}s  cmp {comparison:7.3f}s  {message}")
+
+    if cache is not None:
+        cache.prune()
+
+    total = time.perf_counter() - start
+    summary = ", ".join(f"{count} {status.lower()}" for status, count in sorted(counts.items()))
+    print(f"{len(tests)} tests in {total:.2f}s: {summary}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
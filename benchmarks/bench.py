@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), "src"))
+
+from pipeline.hooks import register_stage_hook, unregister_stage_hook
+from pipeline.stage0 import decode_program
+from pipeline.state import ProcessorState
+from profiling import AllocationTracker, StageTimer
+from simulator import simulate
+from tracing.trace_writer import CycleCounter, TraceWriter
+from workloads import generate
+
+RED = '\x1b[31m'
+GREEN = '\x1b[36m'
+RESET = '\x1b[0m'
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baselines.json")
+MIN_SECONDS = 0.25 # Shorter runs vary by 30% from run to run, their throughput is not compared against the baseline
+
+# Workload knobs, the length is given on the command line
+SUITE = {
+    "independent": {"depth": 1, "registers": 30},
+    "chains": {"depth": 16, "registers": 30},
+    "pressure": {"depth": 2, "registers": 4},
+    "exceptions": {"depth": 1, "registers": 30, "div_zero": 0.001},
+}
+
+STAGES = ("commit", "execute", "issue", "rename", "fetch", "exception")
+
+
+class TimedTrace:
+    """
+    Trace sink measuring the time spent serializing the cycles
+    """
+    def __init__(self, trace):
+        self.trace = trace
+        self.seconds = 0.0
+
+    def append(self, state):
+        start = time.perf_counter()
+        self.trace.append(state)
+        self.seconds += time.perf_counter() - start
+
+
+def peak_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(kind, params, length, seed, memory):
+    """
+    Runs one measurement, meant to be executed in a fresh worker process so peak RSS is its own
+    """
+    program = decode_program(generate(length, seed=seed, **params))
+    state = ProcessorState()
+    result = {}
+
+    if kind == "pipeline":
+        trace = CycleCounter()
+        start = time.perf_counter()
+        simulate(state, program, trace)
+        seconds = time.perf_counter() - start
+        cycles = trace.count
+
+    elif kind == "stages":
+        hooks = [StageTimer()]
+        if memory:
+            hooks.append(AllocationTracker())
+            hooks[1].start()
+        for hook in hooks:
+            register_stage_hook(hook)
+        try:
+            trace = CycleCounter()
+            start = time.perf_counter()
+            simulate(state, program, trace)
+            seconds = time.perf_counter() - start
+            cycles = trace.count
+        finally:
+            for hook in hooks:
+                unregister_stage_hook(hook)
+            if memory:
+                hooks[1].stop()
+        result["stages"] = {
+            name: {
+                "seconds": hooks[0].seconds.get(name, 0.0),
+                "peak_alloc_kb": hooks[1].peak.get(name, 0) / 1024 if memory else 0.0
+            }
+            for name in STAGES
+        }
+
+    elif kind == "trace":
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "trace.json")
+            with TraceWriter(path) as writer:
+                trace = TimedTrace(writer)
+                start = time.perf_counter()
+                simulate(state, program, trace)
+                seconds = time.perf_counter() - start
+                cycles = len(writer)
+            result["serialization_seconds"] = trace.seconds
+            result["bytes"] = os.path.getsize(path)
+
+    else:
+        raise ValueError(f"Unknown measurement: {kind}")
+
+    result["cycles"] = cycles
+    result["seconds"] = seconds
+    result["cycles_per_second"] = cycles / seconds if seconds else 0.0
+    result["peak_rss_kb"] = peak_rss_kb()
+    return result
+
+
+def run_suite(workloads, length, seed, memory, repeat=1):
+    """
+    Runs every measurement repeat times and keeps the fastest run, the others are slowed down by the rest of the machine
+    """
+    results = {}
+
+    for name in workloads:
+        results[name] = {}
+        for kind in ("pipeline", "stages", "trace"):
+            runs = []
+            for _ in range(repeat):
+                # One process per measurement so that the peak RSS is not shared
+                with ProcessPoolExecutor(max_workers=1) as pool:
+                    runs.append(pool.submit(measure, kind, SUITE[name], length, seed, memory).result())
+            results[name][kind] = min(runs, key=lambda run: run["seconds"])
+
+    return results
+
+
+def print_report(results):
+    for name, result in results.items():
+        pipeline = result["pipeline"]
+        trace = result["trace"]
+        stages = result["stages"]
+        print(f"== {name}: {pipeline['cycles']} cycles")
+        print(f"   pipeline : {pipeline['cycles_per_second']:12.0f} cycles/s  {pipeline['peak_rss_kb']:8d} KB peak RSS")
+        print(f"   traced   : {trace['cycles_per_second']:12.0f} cycles/s  {trace['peak_rss_kb']:8d} KB peak RSS"
+              f"  serialization {trace['serialization_seconds']:.3f}s  {trace['bytes']} bytes")
+        total = sum(stats["seconds"] for stats in stages["stages"].values())
+        for stage, stats in stages["stages"].items():
+            share = 100 * stats["seconds"] / total if total else 0.0
+            print(f"   {stage:20s} {stats['seconds']:8.3f}s {share:5.1f}%  {stats['peak_alloc_kb']:10.1f} KB peak alloc")
+
+
+def compare_baseline(results, baseline, tolerance):
+    """
+    Reports the throughput and peak RSS that got worse than the baseline by more than tolerance
+    The throughput of measurements shorter than MIN_SECONDS is timer noise and is not compared,
+    a different cycle count means the simulated machine changed and is reported as such.
+    @return the number of regressions
+    """
+    regressions = 0
+    short = 0
+
+    for name, kinds in baseline["results"].items():
+        for kind, old in kinds.items():
+            new = results["results"].get(name, {}).get(kind)
+            if new is None:
+                continue
+
+            if new["cycles"] != old["cycles"]:
+                print(f"[{RED}Changed{RESET}] {name}.{kind}: {old['cycles']} → {new['cycles']} cycles, the timings are not comparable")
+                regressions += 1
+                continue
+
+            metrics = ["peak_rss_kb"]
+            if old["seconds"] >= MIN_SECONDS:
+                metrics.append("cycles_per_second")
+            else:
+                short += 1
+
+            for metric in metrics:
+                if metric == "cycles_per_second":
+                    ratio = old[metric] / new[metric] if new[metric] else float("inf") # Higher is better
+                else:
+                    ratio = new[metric] / old[metric] # Lower is better
+                if ratio > 1 + tolerance:
+                    print(f"[{RED}Regression{RESET}] {name}.{kind}.{metric}: {old[metric]:.4g} → {new[metric]:.4g} ({100 * (ratio - 1):.1f}% worse)")
+                    regressions += 1
+
+    if short:
+        print(f"{short} measurements shorter than {MIN_SECONDS}s only compared for peak RSS (use a larger --length).")
+    if regressions == 0:
+        print(f"{GREEN}No regression against the baseline.{RESET}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulator throughput benchmark on synthetic workloads")
+    parser.add_argument("--workloads", nargs="+", default=list(SUITE), choices=list(SUITE))
+    parser.add_argument("--length", type=int, default=10000, help="Instructions per program (1e3 - 1e7).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of each measurement, the fastest is kept.")
+    parser.add_argument("--memory", action="store_true", help="Track per-stage allocation peaks with tracemalloc (slower).")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="The baseline file.")
+    parser.add_argument("--save", action="store_true", help="Store the results as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.20, help="Allowed slowdown before reporting a regression.")
+    parser.add_argument("--json", help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    results = {
+        "length": args.length,
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "results": run_suite(args.workloads, args.length, args.seed, args.memory, args.repeat)
+    }
+    print_report(results["results"])
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["length"] != args.length or baseline["seed"] != args.seed:
+            print("The baseline was recorded with another length or seed, not comparing.")
+        elif compare_baseline(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
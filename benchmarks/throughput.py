@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), "src"))
+
+from pipeline.stage0 import decode_program
+from pipeline.state import ProcessorState
+from simulator import simulate
+from tracing.trace_writer import CycleCounter
+from workloads import generate
+
+
+def simulate_final(program):
+    """
+    Runs one program with the scalar simulator, without recording its trace
+    """
+    state = ProcessorState()
+    raised = simulate(state, program, CycleCounter())
+    return raised, state.exception_pc if raised else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Programs per second of the NumPy batch engine against the scalar simulator in a process pool")
+    parser.add_argument("--programs", type=int, default=4096, help="Number of programs.")
+    parser.add_argument("--length", type=int, default=24, help="Instructions per program.")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--div-zero", type=float, default=0.01)
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count())
+    parser.add_argument("--batch-size", type=int, default=4096)
+    args = parser.parse_args()
+
+    programs = [decode_program(generate(args.length, args.depth, div_zero=args.div_zero, seed=seed)) for seed in range(args.programs)]
+
+    from batch_engine import simulate_batch
+    start = time.perf_counter()
+    for first in range(0, len(programs), args.batch_size):
+        simulate_batch(programs[first:first + args.batch_size])
+    numpy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        list(pool.map(simulate_final, programs, chunksize=64))
+    pool_seconds = time.perf_counter() - start
+
+    print(f"numpy engine: {len(programs) / numpy_seconds:9.0f} programs/s")
+    print(f"process pool: {len(programs) / pool_seconds:9.0f} programs/s ({args.jobs} workers)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+import argparse
+import random
+
+# x0 is never written by the generated programs so it stays 0 (divide-by-zero source)
+# x31 is set once to a non-zero value and used as the divisor of the regular divisions
+ZERO_REGISTER = 0
+DIVISOR_REGISTER = 31
+OPCODES = ("add", "addi", "sub", "mulu", "divu", "remu")
+
+
+def generate(length, depth=1, registers=30, div_zero=0.0, seed=0):
+    """
+    Yields a seeded program of `length` instructions over the supported ISA
+    - depth: number of consecutive instructions forming a dependency chain (1 = no forced dependency)
+    - registers: number of logical registers in use (x1 - x30), fewer registers means more WAR/WAW reuse
+    - div_zero: probability of a divu/remu by zero (the first one ends the simulation)
+    """
+    if not 1 <= registers <= 30:
+        raise ValueError(f"registers must be between 1 and 30: {registers}")
+    if depth < 1:
+        raise ValueError(f"depth must be at least 1: {depth}")
+
+    rng = random.Random(seed)
+    pool = range(1, registers + 1)
+
+    yield f"addi x{DIVISOR_REGISTER}, x{ZERO_REGISTER}, 7"
+
+    chain_position = 0
+    last_dest = None
+
+    for _ in range(length - 1):
+        rd = rng.choice(pool)
+        rs1 = last_dest if chain_position else rng.choice(pool)
+        chain_position = (chain_position + 1) % depth
+        last_dest = rd
+
+        if rng.random() < div_zero:
+            opcode = rng.choice(("divu", "remu"))
+            yield f"{opcode} x{rd}, x{rs1}, x{ZERO_REGISTER}"
+            continue
+
+        opcode = rng.choice(OPCODES)
+        if opcode == "addi":
+            yield f"addi x{rd}, x{rs1}, {rng.randrange(-1024, 1024)}"
+        elif opcode in ("divu", "remu"):
+            yield f"{opcode} x{rd}, x{rs1}, x{DIVISOR_REGISTER}"
+        else:
+            yield f"{opcode} x{rd}, x{rs1}, x{rng.choice(pool)}"
+
+
+def write_program(path, program):
+    """
+    Writes a program as a JSON list of instructions without holding it in memory
+    """
+    with open(path, "w") as f:
+        f.write("[")
+        for i, inst in enumerate(program):
+            f.write(",\n  " if i else "\n  ")
+            f.write(f'"{inst}"')
+        f.write("\n]\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generates a seeded synthetic program (input.json)")
+    parser.add_argument("output", help="The program file to write.")
+    parser.add_argument("--length", type=int, default=1000, help="Number of instructions.")
+    parser.add_argument("--depth", type=int, default=1, help="Dependency chain depth.")
+    parser.add_argument("--registers", type=int, default=30, help="Number of logical registers in use (1-30).")
+    parser.add_argument("--div-zero", type=float, default=0.0, help="Probability of a division by zero.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    write_program(args.output, generate(args.length, args.depth, args.registers, args.div_zero, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -7,32 +7,10 @@ GREEN = '\x1b[36m'
 RESET = '\x1b[0m'
 
 
-parser = argparse.ArgumentParser()
-
-parser.add_argument("input", help="The input JSON for comparison.", type=argparse.FileType("r"))
-parser.add_argument("--reference", "-r", required=True, help="The reference JSON.", type=argparse.FileType("r"))
-
-args = parser.parse_args()
-
-INPUT = json.load(args.input)
-REFERENCE = json.load(args.reference)
-
 # INPUT is [{"ActiveList": [], "BusyBitTable": [bool], "DecodedPCs": int, "Exception": bool, "ExceptionPC": int, "FreeList": [int], "IntegerQueue": [{}], "PC": int, "PhysicalRegisterFile": [int], "RegisterMapTable": [int], }]
 # ActiveList: [{"Done": bool, "Exception": bool, "LogicalDestination": int, "OldDestination": int, "PC": int}]
 # IntegerQueue: set' [{"DestRegister": int, "OpAIsReady": bool, "OpARegTag": int, "OpAValue": int, "OpBIsReady": bool, "OpBRegTag": int, "OpBValue": int, "OpCode": str, "PC": int}]
 
-# INPUT must be a list
-if type(INPUT) != list:
-    print(f"[{RED}Error{RESET}] The input JSON must be a list structure")
-    exit(1)
-
-# Reference should be always a list
-if type(REFERENCE) != list:
-    print("The reference JSON should be a list. Please check if you pick a wrong reference file.")
-    print("If the reference fils is not wrong, please contact TA for more information.")
-    exit(2)
-
-
 def compareIntegerQueueEntry(i: dict, r:dict) -> bool:
     '''
         @return true if i and r are the same
@@ -266,15 +244,51 @@ def compareCycleData(i: dict, r: dict) -> bool:
 
     return True
 
-# Now it is the final comparison
-if len(INPUT) != len(REFERENCE):
-    print(f"[{RED}Error{RESET}][CycleData] Cycle count mismatched!")
-    exit(1)
+def compareTraces(INPUT, REFERENCE) -> bool:
+    '''
+        @return true if the INPUT trace matches the REFERENCE trace
+    '''
+
+    # INPUT must be a list
+    if type(INPUT) != list:
+        print(f"[{RED}Error{RESET}] The input JSON must be a list structure")
+        return False
+
+    # Reference should be always a list
+    if type(REFERENCE) != list:
+        print("The reference JSON should be a list. Please check if you pick a wrong reference file.")
+        print("If the reference fils is not wrong, please contact TA for more information.")
+        exit(2)
+
+    # Now it is the final comparison
+    if len(INPUT) != len(REFERENCE):
+        print(f"[{RED}Error{RESET}][CycleData] Cycle count mismatched!")
+        return False
+
+    for i in range(len(INPUT)):
+        if compareCycleData(INPUT[i], REFERENCE[i]) == False:
+            print(f"[{RED}Error{RESET}][CycleData] Cycle {i} data mismatched. Exit.")
+            return False
+
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("input", help="The input JSON for comparison.", type=argparse.FileType("r"))
+    parser.add_argument("--reference", "-r", required=True, help="The reference JSON.", type=argparse.FileType("r"))
 
-for i in range(len(INPUT)):
-    if compareCycleData(INPUT[i], REFERENCE[i]) == False:
-        print(f"[{RED}Error{RESET}][CycleData] Cycle {i} data mismatched. Exit.")
+    args = parser.parse_args()
+
+    INPUT = json.load(args.input)
+    REFERENCE = json.load(args.reference)
+
+    if compareTraces(INPUT, REFERENCE) == False:
         exit(1)
 
-print(f"{GREEN}PASSED!{RESET}")
+    print(f"{GREEN}PASSED!{RESET}")
+
 
+if __name__ == "__main__":
+    main()
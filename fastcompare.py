@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import sys
+from itertools import zip_longest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+from tracing.trace_reader import decode_run, scan_cycles, scan_runs
+
+RED = '\x1b[31m'
+GREEN = '\x1b[36m'
+RESET = '\x1b[0m'
+
+# Same rules as compare.py, but both traces are read incrementally and the exact difference is reported
+CYCLE_TYPES = {
+    "ActiveList": list,
+    "BusyBitTable": list,
+    "DecodedPCs": list,
+    "Exception": bool,
+    "ExceptionPC": int, # Only checked in the reference, and in the input when the reference has an exception
+    "FreeList": list,
+    "IntegerQueue": list,
+    "PC": int,
+    "PhysicalRegisterFile": list,
+    "RegisterMapTable": list
+}
+ACTIVE_LIST_FIELDS = ("Done", "Exception", "LogicalDestination", "OldDestination", "PC")
+INTEGER_QUEUE_FIELDS = ("PC", "OpCode", "DestRegister", "OpAIsReady", "OpBIsReady")
+DIRECT_FIELDS = ("BusyBitTable", "DecodedPCs", "Exception", "PC", "PhysicalRegisterFile", "RegisterMapTable")
+
+# Cycles compared by text at once
+RUN_CYCLES = 64
+WHITESPACE = b" \t\r\n"
+NOT_QUOTE_OR_WHITESPACE = bytes(c for c in range(256) if c not in b'"' + WHITESPACE)
+
+
+def diffValue(name, i, r):
+    '''
+        @return a description of the first difference between two values, None if they are equal
+    '''
+    if type(i) != type(r):
+        return f"{name}: type {type(i).__name__} != {type(r).__name__}"
+
+    if type(i) == list:
+        # Like compare.py the elements are compared by value only
+        if i == r:
+            return None
+        for idx, (a, b) in enumerate(zip(i, r)):
+            if a != b:
+                return f"{name}[{idx}]: {a!r} != {b!r}"
+        if len(i) != len(r):
+            return f"{name}: {len(i)} entries != {len(r)}"
+        return None
+
+    if i != r:
+        return f"{name}: {i!r} != {r!r}"
+    return None
+
+
+def diffActiveList(i: list, r: list):
+    if len(i) != len(r):
+        return f"ActiveList: {len(i)} entries != {len(r)}"
+
+    for idx, (a, b) in enumerate(zip(i, r)):
+        for field in ACTIVE_LIST_FIELDS:
+            if field not in a:
+                return f"ActiveList[{idx}].{field}: missing"
+            diff = diffValue(f"ActiveList[{idx}].{field}", a[field], b[field])
+            if diff:
+                return diff
+    return None
+
+
+def diffIntegerQueue(i: list, r: list):
+    for a in i:
+        if "PC" not in a:
+            return "IntegerQueue: entry without PC"
+
+    # The Integer Queue is compared as a set ordered by PC
+    i = sorted(i, key=lambda x: x["PC"])
+    r = sorted(r, key=lambda x: x["PC"])
+
+    for a, b in zip(i, r):
+        name = f"IntegerQueue[PC={b['PC']}]"
+        for field in INTEGER_QUEUE_FIELDS:
+            if field not in a:
+                return f"{name}.{field}: missing"
+            diff = diffValue(f"{name}.{field}", a[field], b[field])
+            if diff:
+                return diff
+
+        for op in ("A", "B"):
+            field = f"Op{op}Value" if a[f"Op{op}IsReady"] else f"Op{op}RegTag"
+            if field not in a:
+                return f"{name}.{field}: missing"
+            if a[field] != b[field]:
+                return f"{name}.{field}: {a[field]!r} != {b[field]!r}"
+
+    if len(i) != len(r):
+        return f"IntegerQueue: {len(i)} entries != {len(r)}"
+    return None
+
+
+def diffCycle(i: dict, r: dict):
+    '''
+        @return a description of the first difference between two cycles, None if they match
+    '''
+    for n, t in CYCLE_TYPES.items():
+        if n not in r or type(r[n]) != t:
+            print(f"The reference cycle has a missing or mistyped property: {n}")
+            print("Please check if the reference file is correct.")
+            sys.exit(2)
+        if n == "ExceptionPC":
+            continue
+        if n not in i:
+            return f"{n}: missing"
+        if type(i[n]) != t:
+            return f"{n}: type {type(i[n]).__name__} != {t.__name__}"
+
+    diff = diffActiveList(i["ActiveList"], r["ActiveList"])
+    if diff:
+        return diff
+
+    for n in DIRECT_FIELDS:
+        diff = diffValue(n, i[n], r[n])
+        if diff:
+            return diff
+
+    if set(i["FreeList"]) != set(r["FreeList"]):
+        missing = sorted(set(r["FreeList"]) - set(i["FreeList"]))
+        extra = sorted(set(i["FreeList"]) - set(r["FreeList"]))
+        return f"FreeList: missing {missing}, extra {extra}"
+
+    diff = diffIntegerQueue(i["IntegerQueue"], r["IntegerQueue"])
+    if diff:
+        return diff
+
+    if r["Exception"]:
+        if "ExceptionPC" not in i:
+            return "ExceptionPC: missing"
+        diff = diffValue("ExceptionPC", i["ExceptionPC"], r.get("ExceptionPC"))
+        if diff:
+            return diff
+
+    return None
+
+
+def sameText(i, r):
+    '''
+        @return true if two runs of cycles are the same JSON text, whitespace aside
+    '''
+    if i == r:
+        return True
+    if i.translate(None, WHITESPACE) != r.translate(None, WHITESPACE):
+        return False
+    # Same data unless some of the removed whitespace was inside a string
+    return not (whitespaceInString(i) or whitespaceInString(r))
+
+
+def whitespaceInString(raw):
+    '''
+        @return true if a string of the JSON text may contain whitespace
+    '''
+    if b"\\" in raw:
+        return True # Escaped quotes, the strings cannot be found without parsing
+    # Only the quotes and the whitespace are kept: the quotes of a string without whitespace are next to each other,
+    # a string with whitespace leaves its opening quote behind once these pairs are removed
+    return b'"' in raw.translate(None, NOT_QUOTE_OR_WHITESPACE).replace(b'""', b"")
+
+
+def compareCycles(input, reference, start, cycle):
+    '''
+        Parses both traces from the given offsets and compares them cycle by cycle
+        @return (first divergent cycle or None, description, index of the last cycle compared + 1)
+    '''
+    for i, r in zip_longest(scan_cycles(input, start[0]), scan_cycles(reference, start[1])):
+        if i is None:
+            return cycle, "Cycle count mismatched: the input trace ends here", cycle
+        if r is None:
+            return cycle, "Cycle count mismatched: the reference trace ends here", cycle
+
+        diff = diffCycle(i[2], r[2])
+        if diff:
+            return cycle, diff, cycle
+
+        cycle += 1
+
+    return None, None, cycle
+
+
+def compareFiles(input, reference, use_hash=False):
+    '''
+        Streams both traces and stops at the first divergent cycle
+        With use_hash, runs of cycles with the same text (whitespace aside) are skipped without being parsed,
+        only the runs that differ are parsed and compared cycle by cycle
+        @return (first divergent cycle or None, description, number of cycles compared, cycles matched by text)
+    '''
+    if not use_hash:
+        cycle, diff, count = compareCycles(input, reference, (0, 0), 0)
+        return cycle, diff, count, 0
+
+    skipped = 0
+    cycle = 0
+    start = (0, 0)
+
+    for i, r in zip_longest(scan_runs(input, RUN_CYCLES), scan_runs(reference, RUN_CYCLES)):
+        if i is None or r is None:
+            break # One of the traces ends, or is not in the layout of scan_runs
+
+        if i[2] == r[2] and sameText(i[1], r[1]):
+            skipped += r[2]
+        else:
+            inputCycles = decode_run(input, i[0], i[1])
+            referenceCycles = decode_run(reference, r[0], r[1])
+            if i[2] != r[2] or len(inputCycles) != i[2] or len(referenceCycles) != r[2]:
+                break # One of the traces ends, or the runs are not cut between cycles
+
+            for offset, (a, b) in enumerate(zip(inputCycles, referenceCycles)):
+                diff = diffCycle(a, b)
+                if diff:
+                    return cycle + offset, diff, cycle + offset, skipped
+
+        cycle += r[2]
+        start = (i[0] + len(i[1]), r[0] + len(r[1]))
+    else:
+        return None, None, cycle, skipped
+
+    # The rest is parsed cycle by cycle
+    cycle, diff, count = compareCycles(input, reference, start, cycle)
+    return cycle, diff, count, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streams two traces and reports the first divergent cycle")
+    parser.add_argument("input", help="The input JSON for comparison.")
+    parser.add_argument("--reference", "-r", required=True, help="The reference JSON.")
+    parser.add_argument("--hash", action="store_true", help="Skip runs of cycles whose text is identical (whitespace aside) without parsing them.")
+    args = parser.parse_args()
+
+    try:
+        cycle, diff, count, skipped = compareFiles(args.input, args.reference, args.hash)
+    except ValueError as e:
+        print(f"[{RED}Error{RESET}] {e}")
+        sys.exit(1)
+
+    if args.hash:
+        print(f"{skipped} of {count} cycles matched by text.")
+
+    if cycle is not None:
+        print(f"[{RED}Error{RESET}][Cycle {cycle}] {diff}")
+        sys.exit(1)
+
+    print(f"{GREEN}PASSED!{RESET}")
+
+
+if __name__ == "__main__":
+    main()
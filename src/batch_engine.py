@@ -0,0 +1,476 @@
+import numpy as np
+
+from pipeline.config import MachineConfig
+
+OPCODES = ("add", "sub", "mulu", "divu", "remu")
+ADD, SUB, MULU, DIVU, REMU = range(len(OPCODES))
+OPCODE_INDEX = {opcode: i for i, opcode in enumerate(OPCODES)}
+
+# Phases of a machine
+RUNNING = 0 # In pipeline()
+RECOVERING = 1 # In the exception handler
+DONE = 2
+
+NEVER = np.iinfo(np.int64).max
+
+
+class BatchEngine:
+    """
+    Simulates N programs in lockstep, one cycle of every machine per step
+    The state of the machines is held in NumPy arrays with a leading batch axis:
+    - BusyBitTable, PhysicalRegisterFile and RegisterMapTable are (N, registers) arrays
+    - the FreeList and the Active List are circular buffers (head and count per machine)
+    - the Integer Queue is a set of slots, ordered by dispatch age
+    - the DIR is the range of PCs fetched last (fetch groups are consecutive)
+    Every step records one cycle per machine still simulating, the same cycles simulate() records:
+    machines that are done are masked out, machines that took an exception run the rollback instead.
+    Performance counters, stage hooks, the checkpoint recovery mode and the other issue policies are not supported.
+    """
+
+    def __init__(self, programs, config=None):
+        if config is None:
+            config = MachineConfig()
+
+        if config.recovery_mode != "rollback":
+            raise ValueError("The batch engine only models the rollback recovery mode")
+        if config.issue_policy != "oldest":
+            raise ValueError("The batch engine only models the oldest-first issue policy")
+
+        self.config = config
+        n = len(programs)
+        length = max((len(program) for program in programs), default=0)
+        physical = config.physical_registers
+        logical = config.LOGICAL_REGISTERS
+        rows = np.arange(n)
+        self.rows = rows
+
+        # Decoded programs, padded to the longest one
+        self.length = np.array([len(program) for program in programs], dtype=np.int64)
+        self.opcode = np.zeros((n, length), dtype=np.int8)
+        self.rd = np.zeros((n, length), dtype=np.int64)
+        self.rs1 = np.zeros((n, length), dtype=np.int64)
+        self.rs2 = np.zeros((n, length), dtype=np.int64)
+        self.has_imm = np.zeros((n, length), dtype=bool)
+        imm = np.zeros((n, length), dtype=np.int64)
+
+        table = [(i, inst.pc, OPCODE_INDEX[inst.opcode], inst.rd, inst.rs1, inst.rs2 or 0, inst.rs2 is None, inst.imm or 0)
+                 for i, program in enumerate(programs) for inst in program]
+        if table:
+            i, pc, opcode, rd, rs1, rs2, has_imm, value = np.array(table, dtype=np.int64).T
+            self.opcode[i, pc] = opcode
+            self.rd[i, pc] = rd
+            self.rs1[i, pc] = rs1
+            self.rs2[i, pc] = rs2
+            self.has_imm[i, pc] = has_imm
+            imm[i, pc] = value
+        self.imm = imm.view(np.uint64) # Two's complement, the additions wrap like u64()
+
+        # Architectural and rename state
+        self.phase = np.full(n, RUNNING, dtype=np.int8)
+        self.cycle = np.zeros(n, dtype=np.int64)
+        self.pc = np.zeros(n, dtype=np.int64)
+        self.exception = np.zeros(n, dtype=bool)
+        self.exception_pc = np.zeros(n, dtype=np.int64)
+        self.busy_bit_table = np.zeros((n, physical), dtype=bool)
+        self.physical_register_file = np.zeros((n, physical), dtype=np.uint64)
+        self.register_map_table = np.tile(np.arange(logical, dtype=np.int64), (n, 1))
+
+        # FreeList: can hold every physical register
+        self.free_list = np.zeros((n, physical), dtype=np.int64)
+        self.free_list[:, :physical - logical] = np.arange(logical, physical)
+        self.free_head = np.zeros(n, dtype=np.int64)
+        self.free_count = np.full(n, physical - logical, dtype=np.int64)
+
+        # Decoded Instruction Register
+        self.dir_start = np.zeros(n, dtype=np.int64)
+        self.dir_count = np.zeros(n, dtype=np.int64)
+
+        # Active List
+        size = config.active_list_size
+        self.al_logical = np.zeros((n, size), dtype=np.int64)
+        self.al_old = np.zeros((n, size), dtype=np.int64)
+        self.al_pc = np.zeros((n, size), dtype=np.int64)
+        self.al_done = np.zeros((n, size), dtype=bool)
+        self.al_exception = np.zeros((n, size), dtype=bool)
+        self.al_head = np.zeros(n, dtype=np.int64)
+        self.al_count = np.zeros(n, dtype=np.int64)
+
+        # Integer Queue
+        size = config.integer_queue_size
+        self.iq_valid = np.zeros((n, size), dtype=bool)
+        self.iq_age = np.zeros((n, size), dtype=np.int64)
+        self.iq_dest = np.zeros((n, size), dtype=np.int64)
+        self.iq_a_ready = np.zeros((n, size), dtype=bool)
+        self.iq_a_tag = np.zeros((n, size), dtype=np.int64)
+        self.iq_a_value = np.zeros((n, size), dtype=np.uint64)
+        self.iq_b_ready = np.zeros((n, size), dtype=bool)
+        self.iq_b_tag = np.zeros((n, size), dtype=np.int64)
+        self.iq_b_value = np.zeros((n, size), dtype=np.uint64)
+        self.iq_b_imm = np.zeros((n, size), dtype=bool) # OpBValue is a signed immediate
+        self.iq_opcode = np.zeros((n, size), dtype=np.int8)
+        self.iq_pc = np.zeros((n, size), dtype=np.int64)
+        self.iq_entry = np.zeros((n, size), dtype=np.int64) # Active List slot
+        self.iq_count = np.zeros(n, dtype=np.int64)
+        self.age = 0
+
+        # Execute buffer: [0] issued this cycle, [1] executing
+        width = config.issue_width
+        self.execute_buffer = [ExecuteStage(n, width), ExecuteStage(n, width)]
+
+        # Machines with nothing to run only record their initial state
+        self.phase[self.length == 0] = DONE
+
+    def run(self, traces=None):
+        """
+        Runs every machine to completion
+        traces[i], if given, is the trace sink of program i (anything with append(state) calling state.to_json())
+        @return one (registers, exception, exception PC) per program, like functional.run_functional()
+        """
+        raised = np.zeros(len(self.length), dtype=bool)
+        recorded = np.ones(len(self.length), dtype=bool)
+
+        while True:
+            if traces is not None:
+                for i in np.flatnonzero(recorded):
+                    traces[i].append(MachineView(self, i))
+
+            running = self.phase == RUNNING
+            recovering = self.phase == RECOVERING
+            if not (running.any() or recovering.any()):
+                break
+
+            self.recover(recovering)
+            raised |= self.step(running)
+            recorded = running | recovering
+            self.cycle[recorded] += 1
+
+        registers = np.take_along_axis(self.physical_register_file, self.register_map_table, axis=1)
+        return [(registers[i].tolist(), bool(raised[i]), int(self.exception_pc[i]) if raised[i] else 0)
+                for i in range(len(self.length))]
+
+    def step(self, running):
+        """
+        One pipeline cycle of the running machines
+        @return the machines whose commit took an exception
+        """
+        exception = self.commit(running)
+        running = running & ~exception
+
+        # The exception handler starts in the same cycle: it flushes the Integer Queue
+        self.iq_valid[exception] = False
+        self.iq_count[exception] = 0
+        self.phase[exception] = RECOVERING
+
+        self.execute(running)
+        self.execute_buffer.reverse() # shift pipeline: the stage just executed (now empty) becomes [0]
+        self.issue(running)
+        self.rename_and_dispatch(running)
+        self.fetch(running & (self.dir_count == 0))
+
+        # Loop condition of pipeline()
+        self.phase[running & (self.pc >= self.length) & (self.dir_count == 0) & (self.al_count == 0)] = DONE
+        return exception
+
+    def commit(self, running):
+        rows = self.rows
+        size = self.config.active_list_size
+        physical = self.config.physical_registers
+        exception = np.zeros(len(rows), dtype=bool)
+        committing = running.copy()
+
+        for _ in range(self.config.commit_width):
+            committing &= self.al_count > 0
+            head = self.al_head
+            raised = committing & self.al_exception[rows, head]
+            retire = committing & ~raised & self.al_done[rows, head]
+
+            if raised.any():
+                exception |= raised
+                self.exception[raised] = True
+                self.exception_pc[raised] = self.al_pc[raised, head[raised]]
+                self.pc[raised] = 65536
+
+            if retire.any():
+                idx = np.flatnonzero(retire)
+                self.free_list[idx, (self.free_head[idx] + self.free_count[idx]) % physical] = self.al_old[idx, head[idx]]
+                self.free_count[idx] += 1
+                self.al_head[idx] = (head[idx] + 1) % size
+                self.al_count[idx] -= 1
+
+            committing = retire
+            if not committing.any():
+                break
+
+        return exception
+
+    def execute(self, running):
+        stage = self.execute_buffer[1]
+        valid = stage.valid & running[:, None]
+        stage.valid[:] = False
+        if not valid.any():
+            return
+
+        r, c = np.nonzero(valid)
+        op = stage.opcode[r, c]
+        a = stage.a[r, c]
+        b = stage.b[r, c]
+        dest = stage.dest[r, c]
+
+        divide = (op == DIVU) | (op == REMU)
+        exception = divide & (b == 0)
+        divisor = np.where(b == 0, np.uint64(1), b)
+        result = np.select(
+            [op == ADD, op == SUB, op == MULU, op == DIVU],
+            [a + b, a - b, a * b, a // divisor],
+            a % divisor
+        )
+
+        entry = stage.entry[r, c]
+        self.al_done[r, entry] = True
+        self.al_exception[r, entry] |= exception
+
+        ok = ~exception
+        r, c, dest, result = r[ok], c[ok], dest[ok], result[ok]
+        self.busy_bit_table[r, dest] = False
+        self.physical_register_file[r, dest] = result
+
+        # Forwarding path: wake up the pending operands whose tag was just produced
+        rows, position = np.unique(r, return_inverse=True)
+        produced = np.zeros((len(rows), self.config.physical_registers), dtype=bool)
+        produced[position, dest] = True
+        pending = self.iq_valid[rows]
+        for ready, tag, value in ((self.iq_a_ready, self.iq_a_tag, self.iq_a_value),
+                                  (self.iq_b_ready, self.iq_b_tag, self.iq_b_value)):
+            wake = pending & ~ready[rows] & np.take_along_axis(produced, tag[rows], axis=1)
+            wr, slot = np.nonzero(wake)
+            wr = rows[wr]
+            ready[wr, slot] = True
+            value[wr, slot] = self.physical_register_file[wr, tag[wr, slot]]
+            tag[wr, slot] = 0
+
+    def issue(self, running):
+        """
+        Issues the issue_width oldest ready entries of each machine into execute_buffer[0]
+        """
+        width = self.config.issue_width
+        ready = self.iq_valid & self.iq_a_ready & self.iq_b_ready & running[:, None]
+        rows = np.flatnonzero(ready.any(axis=1))
+        if not len(rows):
+            return
+        ready = ready[rows]
+
+        key = np.where(ready, self.iq_age[rows], NEVER)
+        slots = np.argsort(key, axis=1)[:, :width]
+        chosen = np.take_along_axis(ready, slots, axis=1)
+
+        r, c = np.nonzero(chosen)
+        slot = slots[r, c]
+        r = rows[r]
+        stage = self.execute_buffer[0]
+        stage.valid[r, c] = True
+        stage.opcode[r, c] = self.iq_opcode[r, slot]
+        stage.a[r, c] = self.iq_a_value[r, slot]
+        stage.b[r, c] = self.iq_b_value[r, slot]
+        stage.dest[r, c] = self.iq_dest[r, slot]
+        stage.entry[r, c] = self.iq_entry[r, slot]
+
+        self.iq_valid[r, slot] = False
+        self.iq_count[rows] -= chosen.sum(axis=1)
+
+    def rename_and_dispatch(self, running):
+        """
+        Renames and dispatches the whole DIR of the machines with enough room for it
+        """
+        config = self.config
+        count = self.dir_count
+        dispatched = running & (
+            (self.al_count + count <= config.active_list_size) &
+            (self.free_count >= count) &
+            (self.iq_count + count <= config.integer_queue_size)
+        )
+        rmt = self.register_map_table
+        bbt = self.busy_bit_table
+        prf = self.physical_register_file
+
+        # The instructions of a group are renamed in order, one position of every group at a time
+        for k in range(config.fetch_width):
+            idx = np.flatnonzero(dispatched & (count > k))
+            if not len(idx):
+                break
+
+            pc = self.dir_start[idx] + k
+            rd = self.rd[idx, pc]
+            has_imm = self.has_imm[idx, pc]
+
+            physical_rs1 = rmt[idx, self.rs1[idx, pc]]
+            physical_rs2 = rmt[idx, self.rs2[idx, pc]]
+            a_ready = ~bbt[idx, physical_rs1]
+            b_ready = has_imm | ~bbt[idx, physical_rs2]
+            b_value = np.where(has_imm, self.imm[idx, pc], prf[idx, physical_rs2])
+
+            physical_rd = self.free_list[idx, self.free_head[idx]]
+            self.free_head[idx] = (self.free_head[idx] + 1) % config.physical_registers
+            self.free_count[idx] -= 1
+            old_dest = rmt[idx, rd]
+            rmt[idx, rd] = physical_rd
+            bbt[idx, physical_rd] = True
+
+            entry = (self.al_head[idx] + self.al_count[idx]) % config.active_list_size
+            self.al_logical[idx, entry] = rd
+            self.al_old[idx, entry] = old_dest
+            self.al_pc[idx, entry] = pc
+            self.al_done[idx, entry] = False
+            self.al_exception[idx, entry] = False
+            self.al_count[idx] += 1
+
+            slot = np.argmin(self.iq_valid[idx], axis=1)
+            self.iq_valid[idx, slot] = True
+            self.iq_age[idx, slot] = self.age
+            self.iq_dest[idx, slot] = physical_rd
+            self.iq_a_ready[idx, slot] = a_ready
+            self.iq_a_tag[idx, slot] = np.where(a_ready, 0, physical_rs1)
+            self.iq_a_value[idx, slot] = np.where(a_ready, prf[idx, physical_rs1], np.uint64(0))
+            self.iq_b_ready[idx, slot] = b_ready
+            self.iq_b_tag[idx, slot] = np.where(has_imm, 0, physical_rs2)
+            self.iq_b_value[idx, slot] = np.where(b_ready, b_value, np.uint64(0))
+            self.iq_b_imm[idx, slot] = has_imm
+            self.iq_opcode[idx, slot] = self.opcode[idx, pc]
+            self.iq_pc[idx, slot] = pc
+            self.iq_entry[idx, slot] = entry
+            self.iq_count[idx] += 1
+            self.age += 1
+
+        self.dir_count[dispatched] = 0
+
+    def fetch(self, fetching):
+        count = np.clip(self.length - self.pc, 0, self.config.fetch_width)
+        self.dir_start[fetching] = self.pc[fetching]
+        self.dir_count[fetching] = count[fetching]
+        self.pc[fetching] += count[fetching]
+
+    def recover(self, recovering):
+        """
+        One cycle of the exception handler: rolls back rollback_width entries,
+        or ends the simulation of the machines with an empty Active List
+        """
+        finished = recovering & (self.al_count == 0)
+        self.exception[finished] = False
+        self.phase[finished] = DONE
+
+        rmt = self.register_map_table
+        physical = self.config.physical_registers
+        size = self.config.active_list_size
+
+        for _ in range(self.config.rollback_width):
+            idx = np.flatnonzero(recovering & (self.al_count > 0))
+            if not len(idx):
+                break
+
+            entry = (self.al_head[idx] + self.al_count[idx] - 1) % size
+            logical = self.al_logical[idx, entry]
+            mapping = rmt[idx, logical]
+            self.free_list[idx, (self.free_head[idx] + self.free_count[idx]) % physical] = mapping
+            self.free_count[idx] += 1
+            self.busy_bit_table[idx, mapping] = False
+            rmt[idx, logical] = self.al_old[idx, entry]
+            self.al_count[idx] -= 1
+
+
+class ExecuteStage:
+    """
+    The instructions of one execute stage, issue_width slots per machine
+    """
+
+    def __init__(self, n, width):
+        self.valid = np.zeros((n, width), dtype=bool)
+        self.opcode = np.zeros((n, width), dtype=np.int8)
+        self.a = np.zeros((n, width), dtype=np.uint64)
+        self.b = np.zeros((n, width), dtype=np.uint64)
+        self.dest = np.zeros((n, width), dtype=np.int64)
+        self.entry = np.zeros((n, width), dtype=np.int64)
+
+
+class MachineView:
+    """
+    One machine of a BatchEngine, seen as a trace sink expects a ProcessorState
+    """
+    __slots__ = ("engine", "index")
+
+    def __init__(self, engine, index):
+        self.engine = engine
+        self.index = index
+
+    @property
+    def cycle(self):
+        return int(self.engine.cycle[self.index])
+
+    def to_json(self):
+        engine = self.engine
+        i = self.index
+        physical = engine.config.physical_registers
+
+        head = engine.al_head[i]
+        entries = (head + np.arange(engine.al_count[i])) % engine.config.active_list_size
+        active_list = [
+            {
+                "Done": done,
+                "Exception": exception,
+                "LogicalDestination": logical,
+                "OldDestination": old,
+                "PC": pc
+            }
+            for done, exception, logical, old, pc in zip(
+                engine.al_done[i, entries].tolist(), engine.al_exception[i, entries].tolist(),
+                engine.al_logical[i, entries].tolist(), engine.al_old[i, entries].tolist(), engine.al_pc[i, entries].tolist()
+            )
+        ]
+
+        slots = np.flatnonzero(engine.iq_valid[i])
+        slots = slots[np.argsort(engine.iq_age[i, slots])]
+        values = engine.iq_b_value[i, slots]
+        b_values = [signed if imm else unsigned for signed, unsigned, imm in zip(
+            values.view(np.int64).tolist(), values.tolist(), engine.iq_b_imm[i, slots].tolist()
+        )]
+        integer_queue = [
+            {
+                "DestRegister": dest,
+                "OpAIsReady": a_ready,
+                "OpARegTag": a_tag,
+                "OpAValue": a_value,
+                "OpBIsReady": b_ready,
+                "OpBRegTag": b_tag,
+                "OpBValue": b_value,
+                "OpCode": OPCODES[opcode],
+                "PC": pc
+            }
+            for dest, a_ready, a_tag, a_value, b_ready, b_tag, b_value, opcode, pc in zip(
+                engine.iq_dest[i, slots].tolist(), engine.iq_a_ready[i, slots].tolist(), engine.iq_a_tag[i, slots].tolist(),
+                engine.iq_a_value[i, slots].tolist(), engine.iq_b_ready[i, slots].tolist(), engine.iq_b_tag[i, slots].tolist(),
+                b_values,
+                engine.iq_opcode[i, slots].tolist(), engine.iq_pc[i, slots].tolist()
+            )
+        ]
+
+        free = (engine.free_head[i] + np.arange(engine.free_count[i])) % physical
+        start = int(engine.dir_start[i])
+
+        return {
+            "ActiveList": active_list,
+            "BusyBitTable": engine.busy_bit_table[i].tolist(),
+            "DecodedPCs": list(range(start, start + int(engine.dir_count[i]))),
+            "Exception": bool(engine.exception[i]),
+            "ExceptionPC": int(engine.exception_pc[i]),
+            "FreeList": engine.free_list[i, free].tolist(),
+            "IntegerQueue": integer_queue,
+            "PC": int(engine.pc[i]),
+            "PhysicalRegisterFile": engine.physical_register_file[i].tolist(),
+            "RegisterMapTable": engine.register_map_table[i].tolist()
+        }
+
+
+def simulate_batch(programs, config=None, traces=None):
+    """
+    Simulates decoded programs (see decode_program) in lockstep
+    @return one (registers, exception, exception PC) per program
+    """
+    return BatchEngine(programs, config).run(traces)
@@ -0,0 +1,70 @@
+import gzip
+import hashlib
+import pickle
+
+CHECKPOINT_VERSION = 4
+
+
+class StopSimulation(Exception):
+    """
+    Raised by CheckpointTrace to stop the simulation once the checkpoint is saved
+    The trace writers close their output normally on it, the trace ends at the checkpointed cycle
+    """
+
+
+def program_digest(text):
+    """
+    Identifies the program a checkpoint belongs to
+    """
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def save_checkpoint(path, state, digest):
+    """
+    Writes the complete machine state (ProcessorState, including the DIR,
+    the execute buffer and the cycle counter) to a compressed checkpoint file
+    """
+    with gzip.open(path, "wb") as f:
+        pickle.dump((CHECKPOINT_VERSION, digest, state), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_checkpoint(path, digest):
+    """
+    Reads a checkpoint, checking that it was taken for the same program
+    """
+    with gzip.open(path, "rb") as f:
+        version, checkpoint_digest, state = pickle.load(f)
+
+    if version != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version: {version}")
+    if checkpoint_digest != digest:
+        raise ValueError("The checkpoint was taken for another program")
+
+    return state
+
+
+class CheckpointTrace:
+    """
+    Trace sink wrapper saving a checkpoint at the end of a given cycle
+    saved tells whether that cycle was simulated
+    """
+
+    def __init__(self, trace, cycle, path, digest, stop=False):
+        self.trace = trace
+        self.cycle = cycle
+        self.path = path
+        self.digest = digest
+        self.stop = stop
+        self.saved = False
+
+    def __len__(self):
+        return len(self.trace)
+
+    def append(self, state):
+        self.trace.append(state)
+
+        if state.cycle == self.cycle:
+            save_checkpoint(self.path, state, self.digest)
+            self.saved = True
+            if self.stop:
+                raise StopSimulation()
@@ -0,0 +1,116 @@
+import json
+
+
+class PerfCounters:
+    """
+    Per-cycle stall and occupancy counters
+    Attached to state.counters only when requested, the stages skip them when it is None.
+    """
+
+    def __init__(self, config):
+        self.config = config
+
+        self.cycles = 0 # Pipeline cycles
+        self.exception_cycles = 0 # Cycles spent in the exception handler
+        self.squashed = 0 # Active List entries discarded by the exception handler
+
+        # Rename & dispatch: a group is refused when at least one structure is short
+        self.dispatched_groups = 0
+        self.dispatched_instructions = 0
+        self.dispatch_stall_cycles = 0
+        self.dispatch_stall_active_list = 0
+        self.dispatch_stall_free_list = 0
+        self.dispatch_stall_integer_queue = 0
+
+        # Histograms indexed by count
+        self.issued = [0]*(config.issue_width + 1)
+        self.committed = [0]*(config.commit_width + 1)
+        self.integer_queue_occupancy = [0]*(config.integer_queue_size + 1)
+        self.active_list_occupancy = [0]*(config.active_list_size + 1)
+
+    def dispatch_stall(self, active_list_full, free_list_short, integer_queue_full):
+        self.dispatch_stall_cycles += 1
+        if active_list_full:
+            self.dispatch_stall_active_list += 1
+        if free_list_short:
+            self.dispatch_stall_free_list += 1
+        if integer_queue_full:
+            self.dispatch_stall_integer_queue += 1
+
+    def dispatch(self, count):
+        if count:
+            self.dispatched_groups += 1
+            self.dispatched_instructions += count
+
+    def end_cycle(self, state):
+        """
+        Samples the occupancies at the end of a pipeline cycle
+        """
+        self.cycles += 1
+        self.integer_queue_occupancy[len(state.integer_queue)] += 1
+        self.active_list_occupancy[len(state.active_list)] += 1
+
+    def to_json(self):
+        committed = sum(count * n for n, count in enumerate(self.committed))
+        issued = sum(count * n for n, count in enumerate(self.issued))
+
+        return {
+            "Cycles": self.cycles,
+            "ExceptionCycles": self.exception_cycles,
+            "RecoveryMode": self.config.recovery_mode,
+            "SquashedInstructions": self.squashed,
+            "Committed": committed,
+            "IPC": committed / self.cycles if self.cycles else 0.0,
+            "Issued": issued,
+            "IssueUtilization": issued / (self.cycles * self.config.issue_width) if self.cycles else 0.0,
+            "DispatchedGroups": self.dispatched_groups,
+            "DispatchedInstructions": self.dispatched_instructions,
+            "DispatchStallCycles": self.dispatch_stall_cycles,
+            "DispatchStallActiveListFull": self.dispatch_stall_active_list,
+            "DispatchStallFreeListShort": self.dispatch_stall_free_list,
+            "DispatchStallIntegerQueueFull": self.dispatch_stall_integer_queue,
+            "IssueHistogram": self.issued,
+            "CommitHistogram": self.committed,
+            "IntegerQueueOccupancy": self.integer_queue_occupancy,
+            "ActiveListOccupancy": self.active_list_occupancy
+        }
+
+    def write(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_json(), f, indent=2)
+
+    def summary(self):
+        """
+        Human readable report
+        """
+        data = self.to_json()
+        cycles = max(self.cycles, 1)
+
+        lines = [
+            f"Cycles: {self.cycles} (+{self.exception_cycles} in the exception handler)",
+            f"Recovery ({self.config.recovery_mode}): {self.exception_cycles} cycles for {self.squashed} squashed instructions",
+            f"Committed: {data['Committed']}  IPC: {data['IPC']:.3f}",
+            f"Issued: {data['Issued']}  issue slots used: {100 * data['IssueUtilization']:.1f}%",
+            f"Dispatch stalls: {self.dispatch_stall_cycles} cycles ({100 * self.dispatch_stall_cycles / cycles:.1f}%)",
+            f"  Active List full:   {self.dispatch_stall_active_list}",
+            f"  FreeList short:     {self.dispatch_stall_free_list}",
+            f"  Integer Queue full: {self.dispatch_stall_integer_queue}",
+            f"Issued per cycle:    {histogram_line(self.issued)}",
+            f"Committed per cycle: {histogram_line(self.committed)}",
+            f"Integer Queue occupancy: mean {mean(self.integer_queue_occupancy):.1f}, max {maximum(self.integer_queue_occupancy)}",
+            f"Active List occupancy:   mean {mean(self.active_list_occupancy):.1f}, max {maximum(self.active_list_occupancy)}",
+        ]
+        return "\n".join(lines)
+
+
+def histogram_line(histogram):
+    return "  ".join(f"{n}:{count}" for n, count in enumerate(histogram))
+
+
+def mean(histogram):
+    total = sum(histogram)
+    return sum(n * count for n, count in enumerate(histogram)) / total if total else 0.0
+
+
+def maximum(histogram):
+    return max((n for n, count in enumerate(histogram) if count), default=0)
@@ -1,28 +1,87 @@
-import copy
+import logging
+
+logger = logging.getLogger(__name__)
 
 def exception_handler(state, trace):
-    while (state["ActiveList"]):
-        print("Handling exception")
-        
-        state["IntegerQueue"].clear()
+    """
+    Rolls the Active List back, rollback_width youngest entries per cycle
+    The first cycle only flushes the Integer Queue, state.recovering marks that it happened
+    so the rollback can be resumed from a checkpoint.
+    In the checkpoint recovery mode, the whole Active List is discarded in a single cycle instead (see restore_checkpoint).
+    """
+    if not state.recovering:
+        state.integer_queue.clear()
+        state.ready.clear()
+        state.waiting.clear()
+        state.recovering = True
+        if state.timeline is not None:
+            # The fetched group still waiting for dispatch is dropped with the queue
+            state.timeline.squash([inst.pc for inst in state.decoded_instructions], state.cycle + 1)
+        if state.counters is not None:
+            state.counters.exception_cycles += 1
+
+        # add new cycle to output
+        state.cycle += 1
+        trace.append(state)
+
+    while (state.active_list):
+        logger.debug("Handling exception")
+
+        squashed = rollback(state)
+
+        if state.counters is not None:
+            state.counters.exception_cycles += 1
+            state.counters.squashed += squashed
 
         # add new cycle to output
-        trace.append(copy.deepcopy(state))
+        state.cycle += 1
+        trace.append(state)
+
+def rollback(state):
+    """
+    One cycle of the rollback: discards the rollback_width youngest entries of the Active List,
+    or the whole Active List in the checkpoint recovery mode (see restore_checkpoint)
+    @return the number of discarded instructions
+    """
+    if state.config.recovery_mode == "checkpoint":
+        if state.timeline is not None:
+            state.timeline.squash([entry.pc for entry in state.active_list], state.cycle + 1)
+        return restore_checkpoint(state)
+
+    squashed = min(state.config.rollback_width, len(state.active_list))
+
+    # clear active list and restore BBT and RMT
+    for _ in range(squashed):
+        entry = state.active_list.pop()
+        if state.timeline is not None:
+            state.timeline.squash([entry.pc], state.cycle + 1)
+
+        log_reg = entry.logical_destination
+        phys_dest = entry.old_destination
+
+        old_mapping = state.register_map_table[log_reg]
+        if old_mapping is not None:
+            state.free_list.append(old_mapping)
+            state.busy_bit_table[old_mapping] = False
+        state.register_map_table[log_reg] = phys_dest
+
+    return squashed
 
-        last_entries = list(reversed(state["ActiveList"][-4:]))
-    
-        # clear active list and restore BBT and RMT
-        for entry in last_entries:
+def restore_checkpoint(state):
+    """
+    Discards the whole Active List at once: the RMT is restored from the snapshot taken
+    when the excepting instruction (the head) was dispatched, the physical registers of
+    the discarded instructions return to the FreeList youngest first, like a rollback frees them
+    @return the number of discarded instructions
+    """
+    active_list = state.active_list
+    squashed = len(active_list)
 
-            log_reg = entry["LogicalDestination"]
-            phys_dest = entry["OldDestination"]
+    for entry in reversed(active_list):
+        state.free_list.append(entry.destination)
+        state.busy_bit_table[entry.destination] = False
 
-            old_mapping = state["RegisterMapTable"][log_reg]
-            if old_mapping is not None:
-                    state["FreeList"].append(old_mapping)
-                    state["BusyBitTable"][old_mapping] = False
-            state["RegisterMapTable"][log_reg] = phys_dest
+    state.register_map_table[:] = active_list[0].checkpoint
+    active_list.clear()
 
-        del state["ActiveList"][-4:]
-    
-    trace.append(copy.deepcopy(state))
\ No newline at end of file
+    return squashed
@@ -0,0 +1,51 @@
+MASK = 0xFFFFFFFFFFFFFFFF
+
+
+def run_functional(program):
+    """
+    Executes the decoded program directly on the 32 logical registers (no renaming, no timing)
+    Same semantics as execute(): u64 wraparound, divu/remu by zero raise an exception
+    that stops the program at its PC without writing the destination.
+    @return (registers, exception, exception PC)
+    """
+    registers = [0]*32
+
+    for inst in program:
+        op = inst.opcode
+        a = registers[inst.rs1]
+        b = inst.imm if inst.rs2 is None else registers[inst.rs2]
+
+        if op == "add":
+            result = a + b
+        elif op == "sub":
+            result = a - b
+        elif op == "mulu":
+            result = a * b
+        elif b == 0: # divu / remu by zero
+            return registers, True, inst.pc
+        elif op == "divu":
+            result = a // b
+        else: # remu
+            result = a % b
+
+        registers[inst.rd] = result & MASK
+
+    return registers, False, 0
+
+
+def architectural_state(state):
+    """
+    Returns the logical register values of the cycle model (through the RMT)
+    """
+    return [state.physical_register_file[p] for p in state.register_map_table]
+
+
+def to_json(registers, exception, exception_pc):
+    """
+    Summary written by the functional mode
+    """
+    return {
+        "Registers": registers,
+        "Exception": exception,
+        "ExceptionPC": exception_pc
+    }
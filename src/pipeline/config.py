@@ -0,0 +1,81 @@
+import json
+
+from .issue_policy import ISSUE_POLICIES
+
+
+class MachineConfig:
+    """
+    Machine parameters of the modeled core
+    Defaults are the ones of the reference processor (4-wide, 32-entry queues, 64 physical registers)
+    """
+    __slots__ = (
+        "fetch_width",
+        "active_list_size",
+        "integer_queue_size",
+        "issue_width",
+        "commit_width",
+        "physical_registers",
+        "rollback_width",
+        "recovery_mode",
+        "issue_policy"
+    )
+
+    LOGICAL_REGISTERS = 32 # Fixed by the ISA (x0 - x31)
+
+    # rollback: walk the Active List back rollback_width entries per cycle
+    # checkpoint: restore the RMT snapshot taken when the excepting instruction was dispatched, in one cycle
+    RECOVERY_MODES = ("rollback", "checkpoint")
+
+    # Non integer parameters and their possible values
+    CHOICES = {
+        "recovery_mode": RECOVERY_MODES,
+        "issue_policy": ISSUE_POLICIES # See issue_policy.py
+    }
+
+    def __init__(self, **params):
+        self.fetch_width = 4
+        self.active_list_size = 32
+        self.integer_queue_size = 32
+        self.issue_width = 4
+        self.commit_width = 4
+        self.physical_registers = 64
+        self.rollback_width = 4
+        self.recovery_mode = "rollback"
+        self.issue_policy = "oldest"
+
+        for name, value in params.items():
+            if name not in self.__slots__:
+                raise ValueError(f"Unknown machine parameter: {name}")
+            setattr(self, name, value)
+
+        self.validate()
+
+    @classmethod
+    def from_json(cls, path):
+        with open(path) as f:
+            params = json.load(f)
+
+        if type(params) != dict:
+            raise ValueError("The machine configuration must be a JSON object")
+
+        return cls(**params)
+
+    def to_json(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def validate(self):
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if name in self.CHOICES:
+                if value not in self.CHOICES[name]:
+                    raise ValueError(f"Machine parameter {name} must be one of {', '.join(self.CHOICES[name])}: {value}")
+            elif type(value) != int or value < 1:
+                raise ValueError(f"Machine parameter {name} must be a positive integer: {value}")
+
+        # A fetch group is renamed all at once, every structure must be able to hold one
+        if self.physical_registers - self.LOGICAL_REGISTERS < self.fetch_width:
+            raise ValueError(f"Need at least {self.LOGICAL_REGISTERS + self.fetch_width} physical registers for a fetch width of {self.fetch_width}")
+        if self.active_list_size < self.fetch_width:
+            raise ValueError("The Active List must hold at least one fetch group")
+        if self.integer_queue_size < self.fetch_width:
+            raise ValueError("The Integer Queue must hold at least one fetch group")
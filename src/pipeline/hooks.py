@@ -0,0 +1,50 @@
+STAGE_HOOKS = []
+
+
+def register_stage_hook(hook):
+    """
+    Registers an observer called around every stage of the simulation
+    A hook has before(stage) and after(stage) methods, stage being one of
+    commit, execute, issue, rename, fetch, exception and trace (serialization).
+    Hooks are bound when a simulation starts.
+    """
+    STAGE_HOOKS.append(hook)
+
+
+def unregister_stage_hook(hook):
+    STAGE_HOOKS.remove(hook)
+
+
+def hooked(stage, fn):
+    """
+    Returns fn wrapped with the registered hooks, or fn itself when there is none
+    """
+    if not STAGE_HOOKS:
+        return fn
+
+    hooks = tuple(STAGE_HOOKS)
+    reverse = hooks[::-1]
+
+    def call(*args):
+        for hook in hooks:
+            hook.before(stage)
+        try:
+            return fn(*args)
+        finally:
+            for hook in reverse:
+                hook.after(stage)
+
+    return call
+
+
+class HookedTrace:
+    """
+    Trace sink wrapper reporting the serialization to the hooks as the trace stage
+    """
+
+    def __init__(self, trace):
+        self.trace = trace
+        self.append = hooked("trace", trace.append)
+
+    def __len__(self):
+        return len(self.trace)
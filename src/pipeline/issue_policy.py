@@ -0,0 +1,79 @@
+import heapq
+import random
+
+ISSUE_POLICIES = ("oldest", "longest_chain", "random")
+
+
+class ReadySet:
+    """
+    The Integer Queue entries whose operands are both ready, in a priority heap
+    Entries are pushed when they become ready (at dispatch or on wakeup) and issue pops
+    the issue_width best ones, in O(width·log n) instead of scanning the whole queue.
+    Policies (the PC breaks ties, it is also the age since instructions are dispatched in order):
+    - oldest: lowest PC first, the reference behavior
+    - longest_chain: longest chain of dependent instructions first (see chain_heights)
+    - random: uniformly random among the ready entries (seeded, so runs are reproducible)
+    """
+
+    def __init__(self, policy="oldest", seed=0):
+        if policy not in ISSUE_POLICIES:
+            raise ValueError(f"Unknown issue policy: {policy}")
+
+        self.policy = policy
+        self.heap = []
+        self.heights = None # Per PC, computed by prepare() for longest_chain
+        self.random = random.Random(seed)
+
+    def prepare(self, program):
+        """
+        Computes the static priorities the policy needs from the decoded program
+        """
+        if self.policy == "longest_chain" and self.heights is None:
+            self.heights = chain_heights(program)
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, entry):
+        pc = entry.pc
+        if self.policy == "oldest":
+            heapq.heappush(self.heap, (pc, entry))
+        elif self.policy == "longest_chain":
+            heapq.heappush(self.heap, (-self.heights[pc], pc, entry))
+        else:
+            heapq.heappush(self.heap, (self.random.random(), pc, entry))
+
+    def pop(self, count):
+        """
+        Removes and returns up to count entries, best first
+        """
+        heap = self.heap
+        if len(heap) <= count:
+            entries = [item[-1] for item in sorted(heap)]
+            heap.clear()
+            return entries
+        return [heapq.heappop(heap)[-1] for _ in range(count)]
+
+    def clear(self):
+        self.heap.clear()
+
+
+def chain_heights(program):
+    """
+    Returns, for each PC, the length of the longest chain of instructions depending on its result
+    (1 for an instruction whose result is not read), in one backward pass over the program
+    """
+    heights = [1]*len(program)
+    readers = [0]*32 # Per logical register: highest height among the later readers of its current value
+
+    for inst in reversed(program):
+        height = 1 + readers[inst.rd]
+        heights[inst.pc] = height
+
+        # Earlier values of rd are not visible past this instruction, then its own operands are read
+        readers[inst.rd] = 0
+        for source in (inst.rs1, inst.rs2):
+            if source is not None and readers[source] < height:
+                readers[source] = height
+
+    return heights
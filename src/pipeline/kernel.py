@@ -0,0 +1,247 @@
+import heapq
+import operator
+
+from .hooks import STAGE_HOOKS
+from .pipeline import pipeline
+from .stage5 import logger as commit_logger
+from .state import ActiveListEntry, IntegerQueueEntry
+
+# Widths up to this are unrolled, wider machines keep a loop
+UNROLL_LIMIT = 8
+
+# Opcode dispatch table of the ALU, results are truncated to 64 bits by the kernel
+ALU = {
+    "add": operator.add,
+    "sub": operator.sub,
+    "mulu": operator.mul,
+    "divu": operator.floordiv,
+    "remu": operator.mod
+}
+TRAPS = frozenset(("divu", "remu")) # Raise on a zero divisor
+
+MASK = 0xFFFFFFFFFFFFFFFF
+
+KERNELS = {} # Machine parameters → compiled kernel
+
+
+def run_kernel(state, program, trace):
+    """
+    Drop-in replacement of pipeline() running the kernel compiled for state.config
+    The kernel does not report to the performance counters, the timeline or the stage hooks,
+    the generic pipeline runs when one of them is attached.
+    """
+    if state.counters is not None or state.timeline is not None or STAGE_HOOKS:
+        return pipeline(state, program, trace)
+    return compile_kernel(state.config)(state, program, trace)
+
+
+def compile_kernel(config):
+    """
+    Returns the cycle loop specialized for the machine parameters, compiled once per configuration
+    """
+    key = tuple(sorted(config.to_json().items()))
+    kernel = KERNELS.get(key)
+    if kernel is None:
+        namespace = {
+            "ActiveListEntry": ActiveListEntry,
+            "IntegerQueueEntry": IntegerQueueEntry,
+            "ALU": ALU,
+            "TRAPS": TRAPS,
+            "MASK": MASK,
+            "heappush": heapq.heappush,
+            "heappop": heapq.heappop,
+            "commit_logger": commit_logger
+        }
+        code = compile(kernel_source(config), f"<kernel {config.fetch_width}-{config.issue_width}-{config.commit_width}>", "exec")
+        exec(code, namespace)
+        kernel = KERNELS[key] = namespace["kernel"]
+    return kernel
+
+
+def kernel_source(config):
+    """
+    Generates the Python source of the cycle loop for the machine parameters
+    The five stages are inlined in one function with the state structures bound to locals once,
+    the widths and sizes are constants, the commit and issue width loops are unrolled
+    and the ALU dispatches on a table. It runs the same steps as pipeline() and the stages,
+    in the same order, on the same ProcessorState, so the traces are identical.
+    """
+    oldest = config.issue_policy == "oldest"
+    checkpoint = config.recovery_mode == "checkpoint"
+
+    lines = []
+
+    def emit(indent, text):
+        lines.append("    " * indent + text)
+
+    emit(0, "def kernel(state, program, trace):")
+    emit(1, "active_list = state.active_list")
+    emit(1, "free_list = state.free_list")
+    emit(1, "integer_queue = state.integer_queue")
+    emit(1, "register_map_table = state.register_map_table")
+    emit(1, "busy_bit_table = state.busy_bit_table")
+    emit(1, "physical_register_file = state.physical_register_file")
+    emit(1, "waiting = state.waiting")
+    emit(1, "execute_buffer = state.execute_buffer")
+    emit(1, "ready = state.ready")
+    emit(1, "ready.prepare(program)")
+    if oldest:
+        emit(1, "heap = ready.heap")
+    else:
+        emit(1, "push = ready.push")
+        emit(1, "pop = ready.pop")
+    emit(1, "retire = active_list.popleft")
+    emit(1, "release = free_list.append")
+    emit(1, "allocate = free_list.popleft")
+    emit(1, "enter = active_list.append")
+    emit(1, "append = trace.append")
+    emit(1, "length = len(program)")
+    emit(1, "pc = state.pc")
+    emit(1, "DIR = state.decoded_instructions")
+    emit(1, "")
+    emit(1, "while pc < length or DIR or active_list:")
+
+    # === Stage 5: Commit
+    emit(2, "# Commit")
+    if config.commit_width <= UNROLL_LIMIT:
+        # Each commit is nested in the previous one: the next entry is only looked at once the head retired
+        for depth in range(config.commit_width):
+            indent = 2 + 2 * depth
+            emit(indent, "if active_list:")
+            emit(indent + 1, "entry = active_list[0]")
+            emit(indent + 1, "if entry.exception:")
+            emit_exception(emit, indent + 2)
+            emit(indent + 1, "if entry.done:")
+            emit(indent + 2, "retire()")
+            emit(indent + 2, "release(entry.old_destination)")
+    else:
+        emit(2, f"for _ in range({config.commit_width}):")
+        emit(3, "if not active_list:")
+        emit(4, "break")
+        emit(3, "entry = active_list[0]")
+        emit(3, "if entry.exception:")
+        emit_exception(emit, 4)
+        emit(3, "if not entry.done:")
+        emit(4, "break")
+        emit(3, "retire()")
+        emit(3, "release(entry.old_destination)")
+    base = 2
+
+    # === Stage 3 & 4: Execute the group issued two cycles ago
+    emit(base, "# Execute")
+    emit(base, "for inst in execute_buffer[1]:")
+    emit(base + 1, "op = inst.opcode")
+    emit(base + 1, "b = inst.op_b_value")
+    emit(base + 1, "entry = inst.active_entry")
+    emit(base + 1, "entry.done = True")
+    emit(base + 1, "if b == 0 and op in TRAPS:")
+    emit(base + 2, "entry.exception = True")
+    emit(base + 2, "continue")
+    emit(base + 1, "dest = inst.dest_register")
+    emit(base + 1, "result = ALU[op](inst.op_a_value, b) & MASK")
+    emit(base + 1, "busy_bit_table[dest] = False")
+    emit(base + 1, "physical_register_file[dest] = result")
+    emit(base + 1, "if dest in waiting:")
+    emit(base + 2, "for iq_entry in waiting.pop(dest):")
+    emit(base + 3, "if (not iq_entry.op_a_is_ready) and iq_entry.op_a_reg_tag == dest:")
+    emit(base + 4, "iq_entry.op_a_is_ready = True")
+    emit(base + 4, "iq_entry.op_a_value = result")
+    emit(base + 4, "iq_entry.op_a_reg_tag = 0")
+    emit(base + 3, "if (not iq_entry.op_b_is_ready) and iq_entry.op_b_reg_tag == dest:")
+    emit(base + 4, "iq_entry.op_b_is_ready = True")
+    emit(base + 4, "iq_entry.op_b_value = result")
+    emit(base + 4, "iq_entry.op_b_reg_tag = 0")
+    emit(base + 3, "if iq_entry.op_a_is_ready and iq_entry.op_b_is_ready:")
+    emit(base + 4, "heappush(heap, (iq_entry.pc, iq_entry))" if oldest else "push(iq_entry)")
+
+    # === Stage 2: Issue
+    emit(base, "# Issue")
+    if oldest:
+        width = config.issue_width
+        emit(base, "if heap:")
+        emit(base + 1, f"if len(heap) <= {width}:")
+        emit(base + 2, "issued = [item[1] for item in sorted(heap)]")
+        emit(base + 2, "heap.clear()")
+        emit(base + 1, "else:")
+        if width <= UNROLL_LIMIT:
+            emit(base + 2, "issued = [" + ", ".join(["heappop(heap)[1]"] * width) + "]")
+        else:
+            emit(base + 2, f"issued = [heappop(heap)[1] for _ in range({width})]")
+        emit(base + 1, "for entry in issued:")
+        emit(base + 2, "del integer_queue[entry]")
+        emit(base, "else:")
+        emit(base + 1, "issued = []")
+    else:
+        emit(base, f"issued = pop({config.issue_width})")
+        emit(base, "for entry in issued:")
+        emit(base + 1, "del integer_queue[entry]")
+    emit(base, "execute_buffer[1] = execute_buffer[0]")
+    emit(base, "execute_buffer[0] = issued")
+
+    # === Stage 1: Rename & Dispatch the whole group, or keep it in the DIR
+    emit(base, "# Rename & Dispatch")
+    emit(base, "count = len(DIR)")
+    emit(base, f"if (len(active_list) + count <= {config.active_list_size} and len(free_list) >= count"
+               f" and len(integer_queue) + count <= {config.integer_queue_size}):")
+    body = base + 1
+    emit(body, "for inst in DIR:")
+    emit(body + 1, "rd = inst.rd")
+    emit(body + 1, "imm = inst.imm")
+    emit(body + 1, "physical_rs1 = register_map_table[inst.rs1]")
+    emit(body + 1, "a_ready = not busy_bit_table[physical_rs1]")
+    emit(body + 1, "if imm is not None:")
+    emit(body + 2, "b_ready = True")
+    emit(body + 2, "b_tag = 0")
+    emit(body + 2, "b_value = imm")
+    emit(body + 1, "else:")
+    emit(body + 2, "physical_rs2 = register_map_table[inst.rs2]")
+    emit(body + 2, "b_ready = not busy_bit_table[physical_rs2]")
+    emit(body + 2, "b_tag = physical_rs2")
+    emit(body + 2, "b_value = physical_register_file[physical_rs2] if b_ready else 0")
+    emit(body + 1, "physical_rd = allocate()")
+    emit(body + 1, "active_entry = ActiveListEntry(rd, register_map_table[rd], inst.pc, physical_rd)")
+    if checkpoint:
+        emit(body + 1, "if inst.opcode in TRAPS:")
+        emit(body + 2, "active_entry.checkpoint = list(register_map_table)")
+    emit(body + 1, "enter(active_entry)")
+    emit(body + 1, "register_map_table[rd] = physical_rd")
+    emit(body + 1, "busy_bit_table[physical_rd] = True")
+    emit(body + 1, "if a_ready:")
+    emit(body + 2, "iq_entry = IntegerQueueEntry(physical_rd, True, 0, physical_register_file[physical_rs1], "
+                   "b_ready, b_tag, b_value, inst.opcode, inst.pc, active_entry)")
+    emit(body + 2, "integer_queue[iq_entry] = None")
+    emit(body + 2, "if b_ready:")
+    emit(body + 3, "heappush(heap, (inst.pc, iq_entry))" if oldest else "push(iq_entry)")
+    emit(body + 2, "else:")
+    emit(body + 3, "waiting.setdefault(physical_rs2, []).append(iq_entry)")
+    emit(body + 1, "else:")
+    emit(body + 2, "iq_entry = IntegerQueueEntry(physical_rd, False, physical_rs1, 0, "
+                   "b_ready, b_tag, b_value, inst.opcode, inst.pc, active_entry)")
+    emit(body + 2, "integer_queue[iq_entry] = None")
+    emit(body + 2, "waiting.setdefault(physical_rs1, []).append(iq_entry)")
+    emit(body + 2, "if not b_ready and physical_rs2 != physical_rs1:")
+    emit(body + 3, "waiting.setdefault(physical_rs2, []).append(iq_entry)")
+
+    # === Stage 0: Fetch & Decode into the emptied DIR
+    emit(body, "# Fetch & Decode")
+    emit(body, f"DIR = program[pc:pc + {config.fetch_width}]")
+    emit(body, "pc += len(DIR)")
+    emit(body, "state.decoded_pcs = [inst.pc for inst in DIR]")
+    emit(body, "state.decoded_instructions = DIR")
+    emit(body, "state.pc = pc")
+
+    emit(base, "state.cycle += 1")
+    emit(base, "append(state)")
+
+    return "\n".join(lines) + "\n"
+
+
+def emit_exception(emit, indent):
+    """
+    The excepting instruction reached the head of the Active List: same updates as commit(), then the loop ends
+    """
+    emit(indent, "commit_logger.info(f\"[Commit] Exception at PC={entry.pc} → Jumping to 0x10000\")")
+    emit(indent, "state.exception_pc = entry.pc")
+    emit(indent, "state.pc = 65536")
+    emit(indent, "state.exception = True")
+    emit(indent, "return")
@@ -0,0 +1,138 @@
+import mmap
+import struct
+
+from .stage0 import DecodedInstruction, parse_instruction
+
+MAGIC = b"OOOPROG\0"
+VERSION = 1
+
+# Magic, version, number of instructions
+HEADER = struct.Struct("<8sIQ")
+
+# One fixed-width record per instruction: opcode, rd, rs1, rs2 (NO_REGISTER with an immediate), immediate
+RECORD = struct.Struct("<BBBBxxxxq")
+NO_REGISTER = 0xFF
+
+# addi has its own code so the program can be disassembled, it is decoded as add with an immediate
+OPCODES = ("add", "addi", "sub", "mulu", "divu", "remu")
+OPCODE_INDEX = {opcode: i for i, opcode in enumerate(OPCODES)}
+
+
+def assemble(instructions, path):
+    """
+    Writes the packed binary encoding of a program, one instruction at a time
+    Instructions are validated by parse_instruction, the first invalid one is reported with its PC.
+    @return the number of instructions
+    """
+    count = 0
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0))
+
+        for pc, inst_str in enumerate(instructions):
+            try:
+                inst = parse_instruction(inst_str, pc)
+            except ValueError as e:
+                raise ValueError(f"{e} (PC={pc})") from None
+
+            if inst.rs2 is None:
+                f.write(RECORD.pack(OPCODE_INDEX["addi"], inst.rd, inst.rs1, NO_REGISTER, inst.imm))
+            else:
+                f.write(RECORD.pack(OPCODE_INDEX[inst.opcode], inst.rd, inst.rs1, inst.rs2, 0))
+            count += 1
+
+        # The count is known once every instruction is written
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, count))
+
+    return count
+
+
+def disassemble(record):
+    opcode, rd, rs1, rs2, imm = record
+    if rs2 == NO_REGISTER:
+        return f"{OPCODES[opcode]} x{rd}, x{rs1}, {imm}"
+    return f"{OPCODES[opcode]} x{rd}, x{rs1}, x{rs2}"
+
+
+class PackedProgram:
+    """
+    Program read from its packed binary encoding (see assemble)
+    The file is memory mapped, program[i] and program[a:b] only decode the requested instructions,
+    so fetch only ever decodes its window and opening a program does not depend on its length.
+    Behaves like the list of DecodedInstruction returned by decode_program.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.map[:len(MAGIC)] != MAGIC:
+            self.map.close()
+            raise ValueError(f"Not a packed program: {path}")
+
+        magic, version, count = HEADER.unpack_from(self.map)
+        if version != VERSION:
+            self.map.close()
+            raise ValueError(f"Unsupported packed program version: {version}")
+        if len(self.map) != HEADER.size + count * RECORD.size:
+            self.map.close()
+            raise ValueError(f"Truncated packed program: {path}")
+
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.count)
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            if start >= stop:
+                return []
+            data = self.map[HEADER.size + start * RECORD.size:HEADER.size + stop * RECORD.size]
+            return [decode(record, pc) for pc, record in enumerate(RECORD.iter_unpack(data), start)]
+
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("program index out of range")
+        return decode(RECORD.unpack_from(self.map, HEADER.size + index * RECORD.size), index)
+
+    def __iter__(self):
+        for start in range(0, self.count, 4096):
+            yield from self[start:start + 4096]
+
+    def __reversed__(self):
+        for end in range(self.count, 0, -4096):
+            yield from reversed(self[max(0, end - 4096):end])
+
+    def records(self, start=0, stop=None):
+        """
+        Yields the raw (opcode, rd, rs1, rs2, imm) records, for disassembly
+        """
+        stop = self.count if stop is None else min(stop, self.count)
+        for first in range(start, stop, 4096):
+            last = min(first + 4096, stop)
+            yield from RECORD.iter_unpack(self.map[HEADER.size + first * RECORD.size:HEADER.size + last * RECORD.size])
+
+    def close(self):
+        self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+
+def decode(record, pc):
+    opcode, rd, rs1, rs2, imm = record
+    if rs2 == NO_REGISTER:
+        return DecodedInstruction("add", rd, rs1, None, imm, pc)
+    return DecodedInstruction(OPCODES[opcode], rd, rs1, rs2, None, pc)
+
+
+def is_packed_program(path):
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
@@ -1,57 +1,78 @@
-import copy
+import logging
 
+from .hooks import hooked
 from .stage0 import fetch_and_decode
 from .stage1 import rename_and_dispatch
 from .stage2 import issue
 from .stage34 import execute
 from .stage5 import commit
 
-def pipeline(state, instructions, trace):
+logger = logging.getLogger(__name__)
 
-    DIR = [] # Decoded Instruction Register
-    ExecuteBuffer = [[],[]] # From issue → execute
+def pipeline(state, program, trace):
+    """
+    Runs cycles until the program is done or an exception reaches commit
+    The Decoded Instruction Register, the execute buffer and the cycle counter live in state
+    so the pipeline can be resumed from a checkpoint.
+    Stages are wrapped with the registered stage hooks (see hooks.py), if any.
+    """
 
-    counter = 1
+    ExecuteBuffer = state.execute_buffer # From issue → execute
+    state.ready.prepare(program)
+
+    commit_stage = hooked("commit", commit)
+    execute_stage = hooked("execute", execute)
+    issue_stage = hooked("issue", issue)
+    rename_stage = hooked("rename", rename_and_dispatch)
+    fetch_stage = hooked("fetch", fetch_and_decode)
+
+    debug = logger.isEnabledFor(logging.DEBUG)
 
     while (
-        state["PC"] < len(instructions)
-        or state["DecodedPCs"]
-        or state["ActiveList"] 
+        state.pc < len(program)
+        or state.decoded_pcs
+        or state.active_list 
     ):
     # === Stage 5: Commit
-        exception = commit(state)
+        exception = commit_stage(state)
         if exception:
+            if state.counters is not None:
+                state.counters.end_cycle(state)
             break
 
         # === Stage 3 & 4: Execute
-        execute(state, ExecuteBuffer[1])
+        execute_stage(state, ExecuteBuffer[1])
         ExecuteBuffer.pop()  # shift pipeline
         ExecuteBuffer.insert(0, []) # make room for next exec0
 
 
         # === Stage 2: Issue
-        issued = issue(state)
+        issued = issue_stage(state)
         ExecuteBuffer[0].extend(issued)
 
 
 
         # === Stage 1: Rename & Dispacth
-        DIR = rename_and_dispatch(state, DIR)
+        DIR = rename_stage(state, state.decoded_instructions)
 
         # === Stage 0: Fetch & Decode
         if not DIR: 
-            decoded = fetch_and_decode(state, instructions)
+            decoded = fetch_stage(state, program)
             DIR.extend(decoded)
         if DIR:
-            state["DecodedPCs"] = [inst["PC"] for inst in DIR]
+            state.decoded_pcs = [inst.pc for inst in DIR]
+        state.decoded_instructions = DIR
 
+        if state.counters is not None:
+            state.counters.end_cycle(state)
 
         # add new cycle to ouput
-        trace.append(copy.deepcopy(state))
+        state.cycle += 1
+        trace.append(state)
 
-        print(f"Cycle: {counter}")
-        print(f"IQ: {len(state['IntegerQueue'])}")
-        print(f"Leftover: {DIR}")
-        counter += 1
+        if debug:
+            logger.debug(f"Cycle: {state.cycle}")
+            logger.debug(f"IQ: {len(state.integer_queue)}")
+            logger.debug(f"Leftover: {DIR}")
 
     return
\ No newline at end of file
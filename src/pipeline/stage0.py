@@ -1,90 +1,75 @@
-def fetch_and_decode(state, instructions):
+class DecodedInstruction:
+    """
+    Instruction of the decoded program table (immutable once decoded)
+    rs2 is None for instructions with an immediate, imm is None otherwise
+    """
+    __slots__ = ("opcode", "rd", "rs1", "rs2", "imm", "pc")
+
+    def __init__(self, opcode, rd, rs1, rs2, imm, pc):
+        self.opcode = opcode
+        self.rd = rd
+        self.rs1 = rs1
+        self.rs2 = rs2
+        self.imm = imm
+        self.pc = pc
+
+    def __repr__(self):
+        operand = f"imm={self.imm}" if self.rs2 is None else f"rs2={self.rs2}"
+        return f"<{self.opcode} rd={self.rd} rs1={self.rs1} {operand} PC={self.pc}>"
+
+def fetch_and_decode(state, program):
     """
     Simulates stage 0 of the pipeline
-    Fethes and decodes up to 4 instructions 
+    Fetches up to fetch_width instructions from the decoded program (see decode_program),
+    or from a PackedProgram which only decodes this window
     Updates:
     - PC
     - DecodedPCs
     """
-    decoded_instructions = []
-    decoded_pcs = []
-
-    for i in range(4):  # Fetch up to 4 instructions
-        instr_index = state["PC"] + i
+    pc = state.pc
+    decoded_instructions = program[pc:pc + state.config.fetch_width]
 
-        if instr_index >= len(instructions):
-            break  # no more instructions to fetch
+    # Update state
+    state.decoded_pcs = [inst.pc for inst in decoded_instructions]
+    state.pc += len(decoded_instructions)  # advance PC by # of fetched instructions
 
-        inst_str = instructions[instr_index]
-        inst = parse_instruction(inst_str)
+    if state.timeline is not None:
+        state.timeline.fetch(state.decoded_pcs, state.cycle + 1)
 
-        # Keep the PC for the active list
-        inst["PC"] = instr_index
+    return decoded_instructions
 
-        decoded_instructions.append(inst)
-        decoded_pcs.append(instr_index)
+def decode_program(instructions):
+    """
+    Decodes the whole program once before the simulation
+    Invalid instructions are reported here, with their PC
+    """
+    program = []
 
-    # Update state
-    state["DecodedPCs"] = decoded_pcs
-    state["PC"] += len(decoded_instructions)  # advance PC by # of fetched instructions
+    for pc, inst_str in enumerate(instructions):
+        try:
+            program.append(parse_instruction(inst_str, pc))
+        except ValueError as e:
+            raise ValueError(f"{e} (PC={pc})") from None
 
-    return decoded_instructions
+    return program
 
-def parse_instruction(inst_str):
+def parse_instruction(inst_str, pc):
     """
-    Parses assembly instructions and returns dictionnary
+    Parses assembly instructions and returns a DecodedInstruction
     """
     
     parts = inst_str.replace(",", "").split()
     opcode = parts[0]
 
     if opcode == "add":
-        return {
-            "opcode": "add",
-            "rd": validate_register(parts[1]),
-            "rs1": validate_register(parts[2]),
-            "rs2": validate_register(parts[3])
-        }
+        return DecodedInstruction("add", validate_register(parts[1]), validate_register(parts[2]), validate_register(parts[3]), None, pc)
 
     elif opcode == "addi":
-        return {
-            "opcode": "add",  # still using 'add' for addi
-            "rd": validate_register(parts[1]),
-            "rs1": validate_register(parts[2]),
-            "imm": validate_immediate(parts[3])
-        }
-
-    elif opcode == "sub":
-        return {
-            "opcode": "sub",
-            "rd": validate_register(parts[1]),
-            "rs1": validate_register(parts[2]),
-            "rs2": validate_register(parts[3])
-        }
-
-    elif opcode == "mulu":
-        return {
-            "opcode": "mulu",
-            "rd": validate_register(parts[1]),
-            "rs1": validate_register(parts[2]),
-            "rs2": validate_register(parts[3])
-        }
-
-    elif opcode == "divu":
-        return {
-            "opcode": "divu",
-            "rd": validate_register(parts[1]),
-            "rs1": validate_register(parts[2]),
-            "rs2": validate_register(parts[3])
-        }
-
-    elif opcode == "remu":
-        return {
-            "opcode": "remu",
-            "rd": validate_register(parts[1]),
-            "rs1": validate_register(parts[2]),
-            "rs2": validate_register(parts[3])
-        }
+        # still using 'add' for addi
+        return DecodedInstruction("add", validate_register(parts[1]), validate_register(parts[2]), None, validate_immediate(parts[3]), pc)
+
+    elif opcode in ("sub", "mulu", "divu", "remu"):
+        return DecodedInstruction(opcode, validate_register(parts[1]), validate_register(parts[2]), validate_register(parts[3]), None, pc)
 
     else:
         raise ValueError(f"Unknown instruction : {inst_str}")
@@ -1,7 +1,9 @@
+from .state import ActiveListEntry, IntegerQueueEntry
+
 def rename_and_dispatch(state, decoded_instructions):
     """
     Simulates stage 1 of the pipeline
-    Renames and dispatches up to 4 instructions.
+    Renames and dispatches a whole fetch group (up to fetch_width instructions).
     Checks for availability to rename_and_dispatch and if need be apply backpressure
     Updates:
     - ActiveList
@@ -12,70 +14,95 @@ def rename_and_dispatch(state, decoded_instructions):
     """
 
     num_insts = len(decoded_instructions)
+    config = state.config
+
+    active_list = state.active_list
+    free_list = state.free_list
+    integer_queue = state.integer_queue
+    ready = state.ready
+    register_map_table = state.register_map_table
+    busy_bit_table = state.busy_bit_table
+    physical_register_file = state.physical_register_file
+    waiting = state.waiting
 
     can_process_all = (
-        len(state["ActiveList"]) + num_insts <= 32 and
-        len(state["FreeList"]) >= num_insts and
-        len(state["IntegerQueue"]) + num_insts <= 32
+        len(active_list) + num_insts <= config.active_list_size and
+        len(free_list) >= num_insts and
+        len(integer_queue) + num_insts <= config.integer_queue_size
     )
 
+    counters = state.counters
     if not can_process_all:
+        if counters is not None:
+            counters.dispatch_stall(
+                len(active_list) + num_insts > config.active_list_size,
+                len(free_list) < num_insts,
+                len(integer_queue) + num_insts > config.integer_queue_size
+            )
         return decoded_instructions
+    if counters is not None:
+        counters.dispatch(num_insts)
+    if state.timeline is not None:
+        state.timeline.dispatch(decoded_instructions, state.cycle + 1)
+
+    # Only divu / remu can raise, the RMT is snapshotted when one of them is renamed
+    checkpoint = config.recovery_mode == "checkpoint"
 
     for inst in decoded_instructions:    
-        opcode = inst["opcode"]
-        rd = inst["rd"]
-        rs1 = inst["rs1"]
-        rs2 = inst.get("rs2") # Fail-safe for instruction without opB (gets None)
-        imm = inst.get("imm") # Fail-safe for instruction without imm (gets None)
-        pc = inst["PC"]
+        opcode = inst.opcode
+        rd = inst.rd
+        rs1 = inst.rs1
+        rs2 = inst.rs2 # None for instruction without opB
+        imm = inst.imm # None for instruction without imm
+        pc = inst.pc
 
         # Fetch source operand physical registers 
-        physical_rs1 = state["RegisterMapTable"][rs1]
-        physical_rs2 = state["RegisterMapTable"][rs2] if rs2 is not None else None # Fail-safe for instruction without opB (gets None) 
+        physical_rs1 = register_map_table[rs1]
+        physical_rs2 = register_map_table[rs2] if rs2 is not None else None # Fail-safe for instruction without opB (gets None) 
 
         # Verify readiness and get source operand value
-        opA_ready = True
-        opA_ready = not state["BusyBitTable"][physical_rs1]
+        opA_ready = not busy_bit_table[physical_rs1]
 
-        opA_value = state["PhysicalRegisterFile"][physical_rs1]
+        opA_value = physical_register_file[physical_rs1]
 
         if imm is not None:
             opB_ready = True
             opB_value = imm
         else:
-            opB_ready = not state["BusyBitTable"][physical_rs2]
-            opB_value = state["PhysicalRegisterFile"][physical_rs2]
-
-        physical_rd = state["FreeList"].pop(0)
-        old_dest = state["RegisterMapTable"][rd] # For active list
-        state["RegisterMapTable"][rd] = physical_rd # Update RMT after saving old value
-        state["BusyBitTable"][physical_rd] = True # Update BBT for newly used physical register
+            opB_ready = not busy_bit_table[physical_rs2]
+            opB_value = physical_register_file[physical_rs2]
 
         # Update Active List
-        active_entry = {
-            "Done": False,
-            "Exception": False,
-            "LogicalDestination": rd,
-            "OldDestination": old_dest,
-            "PC": pc
-        }
-        state["ActiveList"].append(active_entry)
+        physical_rd = free_list.popleft()
+        active_entry = ActiveListEntry(rd, register_map_table[rd], pc, physical_rd)
+        if checkpoint and opcode in ("divu", "remu"):
+            active_entry.checkpoint = list(register_map_table)
+        active_list.append(active_entry)
+
+        register_map_table[rd] = physical_rd # Update RMT after saving old value
+        busy_bit_table[physical_rd] = True # Update BBT for newly used physical register
 
         # Update Integer Queue
-        iq_entry = {
-            "DestRegister": physical_rd,
-            "OpAIsReady": opA_ready,
-            "OpARegTag": physical_rs1 if not opA_ready else 0,
-            "OpAValue": opA_value if opA_ready else 0,
-            "OpBIsReady": opB_ready,
-            "OpBRegTag": physical_rs2 if (imm is None or not opB_ready) else 0,
-            "OpBValue": opB_value if opB_ready else 0,
-            "OpCode": opcode,
-            "PC": pc
-        }
- 
-        state["IntegerQueue"].append(iq_entry)
+        iq_entry = IntegerQueueEntry(
+            physical_rd,
+            opA_ready,
+            physical_rs1 if not opA_ready else 0,
+            opA_value if opA_ready else 0,
+            opB_ready,
+            physical_rs2 if (imm is None or not opB_ready) else 0,
+            opB_value if opB_ready else 0,
+            opcode,
+            pc,
+            active_entry
+        )
+        integer_queue[iq_entry] = None
+        if opA_ready and opB_ready:
+            ready.push(iq_entry)
+
+        # Subscribe pending operands to the wakeup network (once per producer tag)
+        if not opA_ready:
+            waiting.setdefault(physical_rs1, []).append(iq_entry)
+        if not opB_ready and (opA_ready or physical_rs2 != physical_rs1):
+            waiting.setdefault(physical_rs2, []).append(iq_entry)
 
     return []
-       
\ No newline at end of file
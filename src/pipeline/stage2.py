@@ -1,23 +1,21 @@
 def issue(state): # Need to add forwarding paths!
     """
     Simulates stage 2 of the pipeline
-    Issues up to 4 instrucationsfrom the Integer Queue.
+    Issues up to issue_width instructions from the Integer Queue, chosen by the issue policy
+    among the ready entries (see issue_policy.py).
     Updates:
     - IntegerQueue
     """
-    ready_to_issue = []
+    ready_to_issue = state.ready.pop(state.config.issue_width)
 
-    new_queue = []
+    # Remove the issued entries, the others keep their order
+    integer_queue = state.integer_queue
+    for entry in ready_to_issue:
+        del integer_queue[entry]
 
-    for entry in state["IntegerQueue"]:
-        if entry["OpAIsReady"] and entry["OpBIsReady"] and len(ready_to_issue) < 4:
-            ready_to_issue.append(entry)
-        else:
-            new_queue.append(entry)
-
-    # Update Integer Queue with unissued instructions only
-    state["IntegerQueue"] = new_queue
+    if state.counters is not None:
+        state.counters.issued[len(ready_to_issue)] += 1
+    if state.timeline is not None:
+        state.timeline.issue(ready_to_issue, state.cycle + 1)
 
     return ready_to_issue
-
- 
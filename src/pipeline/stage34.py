@@ -1,21 +1,22 @@
 def execute(state, issued_instructions):
     """
     Simulates stage 3 & 4 of the pipeline
-    Executes up to 4 instructions.
+    Executes the instructions issued two cycles earlier (up to issue_width).
 
     Updates:
     - ActiveList
     - BusyBitTable
     - PhysicalRegisterFile
-    - IntegerQueue
+    - IntegerQueue (through the wakeup network)
+    - Ready set
     """
+    ready = state.ready
 
     for inst in issued_instructions:  
-        op = inst["OpCode"]
-        a = inst.get("OpAValue")
-        b = inst.get("OpBValue")
-        dest = inst["DestRegister"]
-        pc = inst["PC"]
+        op = inst.opcode
+        a = inst.op_a_value
+        b = inst.op_b_value
+        dest = inst.dest_register
 
         exception = False
 
@@ -39,29 +40,32 @@ def execute(state, issued_instructions):
             else:
                 result = a % b
 
-        for entry in state["ActiveList"]:
-            if entry["PC"] == pc:
-                entry["Done"] = True
-                if exception:
-                    entry["Exception"] = True
-
-                break
+        # Mark the Active List entry as done
+        entry = inst.active_entry
+        entry.done = True
+        if exception:
+            entry.exception = True
         
         if not exception:
-            state["BusyBitTable"][dest] = False
+            state.busy_bit_table[dest] = False
             result = u64(result)
-            state["PhysicalRegisterFile"][dest] = result
+            state.physical_register_file[dest] = result
+
+            # Forwarding path: wake up only the entries waiting for this tag
+            for iq_entry in state.waiting.pop(dest, ()):
+                if (not iq_entry.op_a_is_ready) and iq_entry.op_a_reg_tag == dest:
+                    iq_entry.op_a_is_ready = True
+                    iq_entry.op_a_value = result
+                    iq_entry.op_a_reg_tag = 0
+                if (not iq_entry.op_b_is_ready) and iq_entry.op_b_reg_tag == dest:
+                    iq_entry.op_b_is_ready = True
+                    iq_entry.op_b_value = result
+                    iq_entry.op_b_reg_tag = 0 
+                if iq_entry.op_a_is_ready and iq_entry.op_b_is_ready:
+                    ready.push(iq_entry)
 
-        # Forwarding path
-        for iq_entry in state["IntegerQueue"]:
-            if (not iq_entry["OpAIsReady"]) and iq_entry["OpARegTag"] == dest and not exception:
-                iq_entry["OpAIsReady"] = True
-                iq_entry["OpAValue"] = result
-                iq_entry["OpARegTag"] = 0
-            if (not iq_entry["OpBIsReady"]) and iq_entry["OpBRegTag"] == dest and not exception:
-                iq_entry["OpBIsReady"] = True
-                iq_entry["OpBValue"] = result
-                iq_entry["OpBRegTag"] = 0 
+    if state.timeline is not None:
+        state.timeline.complete(issued_instructions, state.cycle + 1)
 
 def u64(val):
     return val & 0xFFFFFFFFFFFFFFFF
@@ -1,7 +1,11 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
 def commit(state):
     """
     Simulates stage 5 of the pipeline
-    Commits up to 4 instructions in order from the ActiveList.
+    Commits up to commit_width instructions in order from the ActiveList.
 
     Updates:
     ActiveList
@@ -9,25 +13,32 @@ def commit(state):
     """
 
     committed = 0
-    max_commit = 4
+    max_commit = state.config.commit_width
 
-    while state["ActiveList"] and committed < max_commit:
-        entry = state["ActiveList"][0]
+    while state.active_list and committed < max_commit:
+        entry = state.active_list[0]
 
         # Handle exception
-        if entry["Exception"]:
-            print(f"[Commit] Exception at PC={entry['PC']} → Jumping to 0x10000")
-            state["ExceptionPC"] = entry["PC"]
-            state["PC"] = 65536
-            state["Exception"] = True
+        if entry.exception:
+            logger.info(f"[Commit] Exception at PC={entry.pc} → Jumping to 0x10000")
+            state.exception_pc = entry.pc
+            state.pc = 65536
+            state.exception = True
+            if state.counters is not None:
+                state.counters.committed[committed] += 1
             return True
 
         # Handle commit
-        if entry["Done"]:
-            state["ActiveList"].pop(0)
-            old_dest = entry["OldDestination"]
-            state["FreeList"].append(old_dest)
+        if entry.done:
+            state.active_list.popleft()
+            old_dest = entry.old_destination
+            state.free_list.append(old_dest)
             committed += 1
+            if state.timeline is not None:
+                state.timeline.commit(entry.pc, state.cycle + 1)
         else:
             break
+
+    if state.counters is not None:
+        state.counters.committed[committed] += 1
     return False 
@@ -0,0 +1,153 @@
+from collections import deque
+
+from .config import MachineConfig
+from .issue_policy import ReadySet
+
+
+class ActiveListEntry:
+    """
+    Entry of the Active List
+    destination and checkpoint are only used by the checkpoint recovery mode (see MachineConfig):
+    the allocated physical register and the RMT before the instruction was renamed (None if not taken)
+    """
+    __slots__ = ("done", "exception", "logical_destination", "old_destination", "pc", "destination", "checkpoint")
+
+    def __init__(self, logical_destination, old_destination, pc, destination=None):
+        self.done = False
+        self.exception = False
+        self.logical_destination = logical_destination
+        self.old_destination = old_destination
+        self.pc = pc
+        self.destination = destination
+        self.checkpoint = None
+
+    def to_json(self):
+        return {
+            "Done": self.done,
+            "Exception": self.exception,
+            "LogicalDestination": self.logical_destination,
+            "OldDestination": self.old_destination,
+            "PC": self.pc
+        }
+
+
+class IntegerQueueEntry:
+    """
+    Entry of the Integer Queue
+    A ready operand has its tag set to 0, a pending operand has its value set to 0
+    Keeps a reference to its Active List entry so execute marks it Done directly
+    """
+    __slots__ = (
+        "dest_register",
+        "op_a_is_ready", "op_a_reg_tag", "op_a_value",
+        "op_b_is_ready", "op_b_reg_tag", "op_b_value",
+        "opcode", "pc", "active_entry"
+    )
+
+    def __init__(self, dest_register, op_a_is_ready, op_a_reg_tag, op_a_value,
+                 op_b_is_ready, op_b_reg_tag, op_b_value, opcode, pc, active_entry):
+        self.dest_register = dest_register
+        self.op_a_is_ready = op_a_is_ready
+        self.op_a_reg_tag = op_a_reg_tag
+        self.op_a_value = op_a_value
+        self.op_b_is_ready = op_b_is_ready
+        self.op_b_reg_tag = op_b_reg_tag
+        self.op_b_value = op_b_value
+        self.opcode = opcode
+        self.pc = pc
+        self.active_entry = active_entry
+
+    def to_json(self):
+        return {
+            "DestRegister": self.dest_register,
+            "OpAIsReady": self.op_a_is_ready,
+            "OpARegTag": self.op_a_reg_tag,
+            "OpAValue": self.op_a_value,
+            "OpBIsReady": self.op_b_is_ready,
+            "OpBRegTag": self.op_b_reg_tag,
+            "OpBValue": self.op_b_value,
+            "OpCode": self.opcode,
+            "PC": self.pc
+        }
+
+
+class ProcessorState:
+    """
+    Processor state shared by all the stages
+    The JSON layout of the trace is only built when a snapshot is taken (to_json)
+    - ActiveList and FreeList are FIFOs (deque)
+    - IntegerQueue is a dict used as an insertion-ordered set of entries (values are None),
+      ready holds its entries whose operands are ready, ordered by the issue policy
+    - BusyBitTable, PhysicalRegisterFile and RegisterMapTable are flat lists indexed by register
+    - waiting is the wakeup network: physical register tag → Integer Queue entries waiting for it
+    - config holds the machine parameters the stages read their widths and sizes from
+    - decoded_instructions (DIR), execute_buffer, cycle and recovering are the pipeline
+      bookkeeping, kept here so a checkpoint of the state is the complete machine
+    - counters are the optional performance counters (None when disabled)
+    - timeline is the optional per-instruction lifecycle record (None when disabled)
+    """
+    __slots__ = (
+        "config",
+        "active_list",
+        "busy_bit_table",
+        "decoded_pcs",
+        "exception",
+        "exception_pc",
+        "free_list",
+        "integer_queue",
+        "ready",
+        "pc",
+        "physical_register_file",
+        "register_map_table",
+        "waiting",
+        "decoded_instructions",
+        "execute_buffer",
+        "cycle",
+        "recovering",
+        "counters",
+        "timeline"
+    )
+
+    def __init__(self, config=None):
+        if config is None:
+            config = MachineConfig()
+
+        logical = config.LOGICAL_REGISTERS
+        physical = config.physical_registers
+
+        self.config = config
+        self.active_list = deque()
+        self.busy_bit_table = [False]*physical
+        self.decoded_pcs = []
+        self.exception = False
+        self.exception_pc = 0
+        self.free_list = deque(range(logical, physical))
+        self.integer_queue = {}
+        self.ready = ReadySet(config.issue_policy)
+        self.pc = 0
+        self.physical_register_file = [0]*physical
+        self.register_map_table = list(range(logical))
+        self.waiting = {}
+        self.decoded_instructions = [] # Decoded Instruction Register
+        self.execute_buffer = [[], []] # From issue → execute
+        self.cycle = 0 # Index of the last recorded cycle
+        self.recovering = False # Exception handler started
+        self.counters = None
+        self.timeline = None
+
+    def to_json(self):
+        """
+        Returns the state in the layout of the trace
+        """
+        return {
+            "ActiveList": [entry.to_json() for entry in self.active_list],
+            "BusyBitTable": list(self.busy_bit_table),
+            "DecodedPCs": list(self.decoded_pcs),
+            "Exception": self.exception,
+            "ExceptionPC": self.exception_pc,
+            "FreeList": list(self.free_list),
+            "IntegerQueue": [entry.to_json() for entry in self.integer_queue],
+            "PC": self.pc,
+            "PhysicalRegisterFile": list(self.physical_register_file),
+            "RegisterMapTable": list(self.register_map_table)
+        }
@@ -0,0 +1,72 @@
+import time
+import tracemalloc
+
+
+class StageTimer:
+    """
+    Stage hook accumulating the wall time of each stage
+    Nested stages (trace inside exception) are excluded from the outer stage.
+    """
+
+    def __init__(self):
+        self.seconds = {}
+        self.calls = {}
+        self.stack = []
+
+    def before(self, stage):
+        now = time.perf_counter()
+        if self.stack:
+            outer, start = self.stack[-1]
+            self.seconds[outer] = self.seconds.get(outer, 0.0) + now - start
+        self.stack.append((stage, now))
+
+    def after(self, stage):
+        now = time.perf_counter()
+        _, start = self.stack.pop()
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + now - start
+        self.calls[stage] = self.calls.get(stage, 0) + 1
+        if self.stack:
+            self.stack[-1] = (self.stack[-1][0], now)
+
+    def report(self):
+        total = sum(self.seconds.values())
+        lines = [f"{'stage':10s} {'calls':>8s} {'seconds':>9s} {'share':>6s}"]
+        for stage, seconds in sorted(self.seconds.items(), key=lambda x: -x[1]):
+            share = 100 * seconds / total if total else 0.0
+            lines.append(f"{stage:10s} {self.calls[stage]:8d} {seconds:9.3f} {share:5.1f}%")
+        return "\n".join(lines)
+
+
+class AllocationTracker:
+    """
+    Stage hook tracking allocations with tracemalloc
+    For each stage: net allocated bytes and the peak above the memory in use when the stage started.
+    The peak of an outer stage does not see the allocations of its nested stages.
+    """
+
+    def __init__(self):
+        self.allocated = {}
+        self.peak = {}
+        self.stack = []
+
+    def start(self):
+        tracemalloc.start()
+
+    def stop(self):
+        tracemalloc.stop()
+
+    def before(self, stage):
+        tracemalloc.reset_peak()
+        self.stack.append(tracemalloc.get_traced_memory()[0])
+
+    def after(self, stage):
+        current, peak = tracemalloc.get_traced_memory()
+        start = self.stack.pop()
+        self.allocated[stage] = self.allocated.get(stage, 0) + current - start
+        self.peak[stage] = max(self.peak.get(stage, 0), peak - start)
+
+    def report(self):
+        lines = [f"{'stage':10s} {'net KB':>10s} {'peak KB':>10s}"]
+        for stage in sorted(self.peak, key=lambda x: -self.peak[x]):
+            lines.append(f"{stage:10s} {self.allocated[stage] / 1024:10.1f} {self.peak[stage] / 1024:10.1f}")
+        return "\n".join(lines)
@@ -0,0 +1,181 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(SOURCE_DIR)
+
+DEFAULT_DIRECTORY = os.path.join(ROOT, ".simcache")
+DEFAULT_LIMIT = 256 << 20 # bytes
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def source_digest(directory=SOURCE_DIR):
+    """
+    Identifies the simulator: hash of the path and contents of every source file under src/
+    """
+    h = hashlib.sha256()
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+        for name in sorted(files):
+            if name.endswith(".py"):
+                path = os.path.join(root, name)
+                h.update(os.path.relpath(path, directory).encode() + b"\0")
+                h.update(bytes.fromhex(file_digest(path)))
+    return h.hexdigest()
+
+
+def run_options(config, compact=False, compress=False, binary=False, engine="scalar"):
+    """
+    The options of a run that change its trace
+    """
+    return {
+        "config": config.to_json(),
+        "compact": compact,
+        "compress": bool(compress),
+        "binary": binary,
+        "engine": engine
+    }
+
+
+class ResultCache:
+    """
+    Local on-disk cache of simulation traces and comparison verdicts, addressed by content
+    - a trace is keyed by the program text, the simulator sources and the run options,
+      it is stored compressed with the final architectural state of the run
+    - a verdict is keyed by the two compared traces and compare.py
+    Reading an entry refreshes its modification time, prune() removes the least recently used
+    entries once the cache holds more than limit bytes.
+    """
+
+    def __init__(self, directory=DEFAULT_DIRECTORY, limit=DEFAULT_LIMIT):
+        self.directory = directory
+        self.limit = limit
+        self.sources = source_digest()
+
+    def trace_key(self, program_text, options):
+        key = {
+            "sources": self.sources,
+            "program": hashlib.sha256(program_text.encode()).hexdigest(),
+            "options": options
+        }
+        return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+    def verdict_key(self, output, reference):
+        key = {
+            "compare": file_digest(os.path.join(ROOT, "compare.py")),
+            "output": file_digest(output),
+            "reference": file_digest(reference)
+        }
+        return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+    def path(self, key, suffix):
+        return os.path.join(self.directory, key[:2], key + suffix)
+
+    def fetch_trace(self, key, output):
+        """
+        Copies the cached trace to output
+        @return the final (registers, exception, exception PC) of the run, None on a miss
+        """
+        meta = self.read_json(key, ".json")
+        trace = self.path(key, ".trace.gz")
+        if meta is None or not os.path.isfile(trace):
+            return None
+
+        with gzip.open(trace, "rb") as src, AtomicFile(output) as dst:
+            shutil.copyfileobj(src, dst)
+        os.utime(trace)
+
+        registers, exception, exception_pc = meta["final"]
+        return registers, exception, exception_pc
+
+    def store_trace(self, key, output, final):
+        with open(output, "rb") as src, AtomicFile(self.path(key, ".trace.gz")) as dst:
+            with gzip.GzipFile(fileobj=dst, mode="wb", compresslevel=1, mtime=0) as compressed:
+                shutil.copyfileobj(src, compressed)
+        self.write_json(key, ".json", {"final": list(final)})
+
+    def fetch_verdict(self, key):
+        """
+        @return the stored (status, message) of a comparison, None on a miss
+        """
+        verdict = self.read_json(key, ".verdict.json")
+        return None if verdict is None else (verdict["status"], verdict["message"])
+
+    def store_verdict(self, key, status, message):
+        self.write_json(key, ".verdict.json", {"status": status, "message": message})
+
+    def read_json(self, key, suffix):
+        path = self.path(key, suffix)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        os.utime(path)
+        return data
+
+    def write_json(self, key, suffix, data):
+        with AtomicFile(self.path(key, suffix)) as f:
+            f.write(json.dumps(data).encode())
+
+    def prune(self):
+        """
+        Removes the least recently used entries until the cache fits in its limit
+        """
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue # Removed by a concurrent run
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.limit:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+class AtomicFile:
+    """
+    Binary file written under a temporary name and renamed into place on success,
+    so concurrent runs never read a partial entry
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        fd, self.temporary = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        os.chmod(self.temporary, 0o644)
+        self.file = os.fdopen(fd, "wb")
+
+    def __enter__(self):
+        return self.file
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.file.close()
+        if exc_type is None:
+            os.replace(self.temporary, self.path)
+        else:
+            os.remove(self.temporary)
@@ -0,0 +1,316 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import functional
+from counters import PerfCounters
+from pipeline.config import MachineConfig
+from pipeline.stage0 import decode_program
+from pipeline.state import ProcessorState
+from simulator import simulate
+from tracing.trace_writer import CycleCounter, TraceWriter
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY = 16 << 20 # bytes
+CHUNK_SIZE = 1 << 16
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+    504: "Gateway Timeout"
+}
+
+
+class JobTimeout(Exception):
+    """
+    Raised inside a worker when a job runs longer than its timeout
+    """
+
+
+def init_worker():
+    """
+    Runs once in every worker process: the simulator is already imported, only the timeout is set up
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN) # The service shuts the pool down itself
+    signal.signal(signal.SIGALRM, raise_timeout)
+
+
+def raise_timeout(signum, frame):
+    raise JobTimeout()
+
+
+def warm_up():
+    return os.getpid()
+
+
+def run_job(instructions, params, path, pretty, timeout):
+    """
+    Simulates one program inside a worker
+    With a path, the trace is written there, otherwise only the cycles are counted.
+    The job is interrupted by SIGALRM after timeout seconds.
+    @return the summary of the run
+    """
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        program = decode_program(instructions)
+        state = ProcessorState(MachineConfig(**params))
+        state.counters = PerfCounters(state.config)
+
+        if path is None:
+            trace = CycleCounter()
+            raised = simulate(state, program, trace)
+        else:
+            with TraceWriter(path, pretty) as trace:
+                raised = simulate(state, program, trace)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+    return {
+        "Cycles": len(trace),
+        "Exception": raised,
+        "ExceptionPC": state.exception_pc if raised else 0,
+        "Registers": functional.architectural_state(state),
+        "Counters": state.counters.to_json()
+    }
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class SimulationService:
+    """
+    Minimal HTTP/1.1 front end (one request per connection) queuing the jobs to a process pool
+    - POST /simulate: the body is the input.json list, or {"program": [...], "config": {...}}
+      ?output=trace (default) streams the trace, ?output=summary returns the final state and counters,
+      ?compact=1 writes the trace without indentation
+    - GET /health: pool and queue status
+    At most max_pending jobs are accepted at once, the others are refused with 503 (backpressure),
+    a job running longer than timeout seconds is stopped and answered with 504.
+    """
+
+    def __init__(self, pool, jobs, max_pending, timeout, work_dir):
+        self.pool = pool
+        self.jobs = jobs
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.work_dir = work_dir
+        self.pending = 0
+        self.completed = 0
+        self.refused = 0
+
+    async def handle(self, reader, writer):
+        try:
+            try:
+                method, target, headers, body = await read_request(reader)
+                await self.route(method, target, body, writer)
+            except HttpError as e:
+                await respond_json(writer, e.status, {"error": str(e)})
+            except Exception as e:
+                logger.exception("job failed")
+                await respond_json(writer, 500, {"error": f"{type(e).__name__}: {e}"})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass # The client went away
+        finally:
+            writer.close()
+
+    async def route(self, method, target, body, writer):
+        url = urlsplit(target)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+
+        if url.path == "/health":
+            await respond_json(writer, 200, {
+                "workers": self.jobs,
+                "pending": self.pending,
+                "maxPending": self.max_pending,
+                "completed": self.completed,
+                "refused": self.refused
+            })
+        elif url.path == "/simulate":
+            if method != "POST":
+                raise HttpError(405, "POST a program to /simulate")
+            await self.simulate(query, body, writer)
+        else:
+            raise HttpError(404, f"Unknown path: {url.path}")
+
+    async def simulate(self, query, body, writer):
+        instructions, params = parse_job(body)
+        output = query.get("output", "trace")
+        if output not in ("trace", "summary"):
+            raise HttpError(400, f"Unknown output: {output}")
+
+        if self.pending >= self.max_pending:
+            self.refused += 1
+            raise HttpError(503, "Too many pending jobs, retry later")
+
+        path = None
+        if output == "trace":
+            fd, path = tempfile.mkstemp(dir=self.work_dir, suffix=".json")
+            os.close(fd)
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            job = loop.run_in_executor(self.pool, run_job, instructions, params, path,
+                                       query.get("compact") != "1", self.timeout)
+            try:
+                summary = await job
+            except JobTimeout:
+                raise HttpError(504, f"The simulation did not end within {self.timeout}s")
+            except ValueError as e:
+                raise HttpError(400, str(e))
+            finally:
+                self.pending -= 1
+            self.completed += 1
+
+            if path is None:
+                await respond_json(writer, 200, summary)
+            else:
+                await respond_file(writer, path, {"X-Simulation-Cycles": summary["Cycles"]})
+        finally:
+            if path is not None and os.path.exists(path):
+                os.remove(path)
+
+
+def parse_job(body):
+    try:
+        job = json.loads(body)
+    except ValueError as e:
+        raise HttpError(400, f"Invalid JSON: {e}")
+
+    if type(job) == list:
+        job = {"program": job}
+    if type(job) != dict or type(job.get("program")) != list:
+        raise HttpError(400, "Expected the input.json list or {\"program\": [...], \"config\": {...}}")
+
+    instructions = job["program"]
+    params = job.get("config", {})
+    if not all(type(inst) == str for inst in instructions):
+        raise HttpError(400, "Instructions must be strings")
+    if type(params) != dict:
+        raise HttpError(400, "The machine configuration must be a JSON object")
+
+    # Rejected here rather than in a worker
+    try:
+        MachineConfig(**params)
+    except ValueError as e:
+        raise HttpError(400, str(e))
+
+    return instructions, params
+
+
+async def read_request(reader):
+    request_line = await reader.readline()
+    try:
+        method, target, _ = request_line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise HttpError(400, "Malformed request line")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HttpError(400, "Invalid Content-Length")
+    if length > MAX_BODY:
+        raise HttpError(413, f"The body is limited to {MAX_BODY} bytes")
+
+    body = await reader.readexactly(length)
+    return method, target, headers, body
+
+
+def head(status, content_type, length, extra=None):
+    lines = [f"HTTP/1.1 {status} {REASONS[status]}",
+             f"Content-Type: {content_type}",
+             f"Content-Length: {length}",
+             "Connection: close"]
+    if status == 503:
+        lines.append("Retry-After: 1")
+    if extra:
+        lines += [f"{name}: {value}" for name, value in extra.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def respond_json(writer, status, data):
+    body = json.dumps(data).encode()
+    writer.write(head(status, "application/json", len(body)) + body)
+    await writer.drain()
+
+
+async def respond_file(writer, path, extra):
+    """
+    Streams a file by chunks, waiting for the client to read each one
+    """
+    writer.write(head(200, "application/json", os.path.getsize(path), extra))
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            writer.write(chunk)
+            await writer.drain()
+
+
+async def serve(service, host, port, unix):
+    if unix:
+        server = await asyncio.start_unix_server(service.handle, path=unix, backlog=1024)
+        logger.info(f"listening on {unix}")
+    else:
+        server = await asyncio.start_server(service.handle, host, port, backlog=1024)
+        logger.info(f"listening on http://{host}:{port}")
+
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local simulation service: HTTP front end over a pool of pre-warmed simulator processes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8470)
+    parser.add_argument("--unix", help="Listen on this Unix socket instead of TCP.")
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count(), help="Number of worker processes.")
+    parser.add_argument("--max-pending", type=int, default=256, help="Jobs queued or running at once, more are refused with 503.")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Seconds a job may run before it is stopped (504).")
+    args = parser.parse_args()
+
+    # Only the service logs, the simulator stays silent in the workers
+    logging.basicConfig(format="%(message)s")
+    logger.setLevel(logging.INFO)
+
+    with tempfile.TemporaryDirectory(prefix="simulation-service-") as work_dir, \
+            ProcessPoolExecutor(max_workers=args.jobs, initializer=init_worker) as pool:
+        # Start every worker before accepting jobs
+        for future in [pool.submit(warm_up) for _ in range(args.jobs)]:
+            future.result()
+        logger.info(f"{args.jobs} workers ready")
+        signal.signal(signal.SIGTERM, signal.default_int_handler) # Clean shutdown on kill as well
+
+        service = SimulationService(pool, args.jobs, args.max_pending, args.timeout, work_dir)
+        try:
+            asyncio.run(serve(service, args.host, args.port, args.unix))
+        except KeyboardInterrupt:
+            logger.info("shutting down")
+        finally:
+            if args.unix and os.path.exists(args.unix):
+                os.remove(args.unix)
+
+
+if __name__ == "__main__":
+    main()
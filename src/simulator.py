@@ -1,57 +1,215 @@
-import sys
+import argparse
 import json
-import copy
+import logging
 
+import functional
+from counters import PerfCounters
+from checkpoint import CheckpointTrace, StopSimulation, load_checkpoint, program_digest
+from pipeline.config import MachineConfig
+from pipeline.hooks import STAGE_HOOKS, HookedTrace, hooked, register_stage_hook
+from pipeline.kernel import run_kernel
+from pipeline.packed_program import PackedProgram, is_packed_program
 from pipeline.pipeline import pipeline
+from pipeline.stage0 import decode_program
+from pipeline.state import ProcessorState
 from exception_handling.exception_handler import exception_handler
+from profiling import AllocationTracker, StageTimer
+from timeline import Timeline
+from result_cache import DEFAULT_DIRECTORY, ResultCache, file_digest, run_options
+from tracing.binary_trace import BinaryTraceWriter
+from tracing.trace_policy import EVENTS, CycleWindow, EventRing, EveryNthCycle
+from tracing.trace_writer import TraceWriter
 
 def main():
-    if len(sys.argv) != 3:
-        print("Error use the following command: python simulator.py input.json output.json")
-        return
+    parser = argparse.ArgumentParser(description="Out-of-order processor simulator")
+    parser.add_argument("input", help="The program to simulate (JSON list of instructions, or packed by assembler.py).")
+    parser.add_argument("output", help="The output trace (JSON list of cycles).")
+    parser.add_argument("--compact", action="store_true", help="Write the trace without indentation.")
+    parser.add_argument("--config", help="Machine parameters (JSON object), defaults to the reference 4-wide core.")
+    parser.add_argument("--functional", action="store_true", help="Only execute the ISA semantics and write the final logical registers and ExceptionPC.")
+    parser.add_argument("--engine", choices=("scalar", "kernel"), default="scalar", help="Run the stage functions (scalar) or the cycle loop generated and compiled for the machine parameters (kernel), same trace.")
+    parser.add_argument("--binary", action="store_true", help="Write the binary columnar trace (see tracebin.py) instead of JSON.")
+    parser.add_argument("--gzip", action="store_true", default=None, help="Compress the trace (default for .gz outputs).")
+    parser.add_argument("--trace-every", type=int, metavar="N", help="Only record every Nth cycle.")
+    parser.add_argument("--trace-window", type=int, nargs=2, metavar=("FIRST", "LAST"), help="Only record the cycles FIRST to LAST.")
+    parser.add_argument("--trace-ring", type=int, metavar="K", help="Keep the last K cycles in memory and only record them when a --trace-on event fires.")
+    parser.add_argument("--trace-on", action="append", choices=EVENTS, help="Event flushing the ring buffer: the exception reaches the handler, a dispatch stall, or --trace-pc commits (default: exception, repeatable).")
+    parser.add_argument("--trace-pc", type=int, help="The PC watched by --trace-on commit.")
+    parser.add_argument("--trace-after", type=int, default=0, metavar="M", help="Also record the M cycles following each event.")
+    parser.add_argument("--checkpoint", help="Save the complete machine state to this file at the end of cycle --checkpoint-at.")
+    parser.add_argument("--checkpoint-at", type=int, help="The cycle to checkpoint.")
+    parser.add_argument("--stop", action="store_true", help="Stop the simulation once the checkpoint is saved, the trace is kept up to the checkpointed cycle.")
+    parser.add_argument("--counters", help="Collect performance counters, print a summary and write them to this JSON file.")
+    parser.add_argument("--timeline", help="Record the cycle each instruction was fetched, dispatched, issued, completed, committed or squashed, and write the table to this JSON file (see timeline.py).")
+    parser.add_argument("--timeline-chrome", help="Write the instruction timeline in the Trace Event Format (chrome://tracing, Perfetto) to this file.")
+    parser.add_argument("--profile", action="store_true", help="Print the wall time spent in each stage and in serialization.")
+    parser.add_argument("--profile-memory", action="store_true", help="Print the allocations of each stage (tracemalloc, slow).")
+    parser.add_argument("--verbose", "-v", action="count", default=0, help="Log exceptions (-v) and every cycle (-vv).")
+    parser.add_argument("--cache", nargs="?", const=DEFAULT_DIRECTORY, help="Reuse the trace of an identical earlier run (same program, sources and options), cached in this directory (default: .simcache).")
+    parser.add_argument("--cache-size", type=int, default=256, help="Cache size limit in MB, the least recently used entries are removed.")
+    parser.add_argument("--resume", help="Continue the simulation from a checkpoint, the trace starts at the checkpointed cycle.")
+    args = parser.parse_args()
+
+    logging.basicConfig(format="%(message)s", level=[logging.WARNING, logging.INFO, logging.DEBUG][min(args.verbose, 2)])
+
+    if (args.checkpoint is None) != (args.checkpoint_at is None):
+        parser.error("--checkpoint and --checkpoint-at go together")
+    if args.resume and args.config:
+        parser.error("a resumed simulation keeps the machine parameters of its checkpoint")
+    policies = [args.trace_every is not None, args.trace_window is not None, args.trace_ring is not None]
+    if sum(policies) > 1:
+        parser.error("--trace-every, --trace-window and --trace-ring are exclusive")
+    if (args.trace_on or args.trace_pc is not None or args.trace_after) and args.trace_ring is None:
+        parser.error("--trace-on, --trace-pc and --trace-after apply to --trace-ring")
+    if "commit" in (args.trace_on or []) and args.trace_pc is None:
+        parser.error("--trace-on commit needs --trace-pc")
+    if args.trace_every is not None and args.trace_every < 1:
+        parser.error("--trace-every needs a period of at least 1 cycle")
+    if args.trace_window is not None and not 0 <= args.trace_window[0] <= args.trace_window[1]:
+        parser.error("--trace-window needs 0 <= FIRST <= LAST")
+    if args.trace_ring is not None and args.trace_ring < 1:
+        parser.error("--trace-ring needs at least 1 cycle")
+    if args.binary and (args.gzip or args.compact or args.output.endswith(".gz")):
+        parser.error("the binary trace is neither indented nor compressed, --compact, --gzip and .gz outputs apply to JSON traces")
+    if any(policies) and args.binary:
+        parser.error("the binary trace records every cycle, the recorded cycles are numbered in the JSON trace only")
+    if args.cache and (any(policies) or args.checkpoint or args.resume or args.counters or args.timeline or args.timeline_chrome or args.profile or args.profile_memory):
+        parser.error("--cache only applies to plain simulations")
 
-    input = sys.argv[1]
-    output = sys.argv[2]
+    # Load and decode input
+    if is_packed_program(args.input):
+        # Memory mapped, only the fetched instructions are decoded
+        if args.cache:
+            parser.error("--cache only applies to JSON programs")
+        program = PackedProgram(args.input)
+        digest = file_digest(args.input)
+    else:
+        with open(args.input) as f:
+            text = f.read()
+        program = decode_program(json.loads(text))
+        digest = program_digest(text)
 
-    # Load input 
-    with open(input) as f:
-        instructions = json.load(f)
+    if args.functional:
+        with open(args.output, "w") as f:
+            json.dump(functional.to_json(*functional.run_functional(program)), f, indent=2)
+        return
 
     # Initialize processor state
-    state = {
-        "ActiveList" : [],
-        "BusyBitTable": [False]*64,
-        "DecodedPCs": [], 
-        "Exception": False,
-        "ExceptionPC": 0,
-        "FreeList": list(range(32, 64)),
-        "IntegerQueue": [],
-        "PC": 0,
-        "PhysicalRegisterFile": [0]*64,
-        "RegisterMapTable": list(range(32))
-    }
-
-    trace = []
-
-    # Initial state 
-    trace.append(copy.deepcopy(state))
+    if args.resume:
+        state = load_checkpoint(args.resume, digest)
+        if (args.timeline or args.timeline_chrome) and state.timeline is None:
+            # The instructions fetched before the checkpoint would have no record
+            parser.error("--timeline and --timeline-chrome need a checkpoint taken with --timeline or --timeline-chrome")
+    else:
+        try:
+            config = MachineConfig.from_json(args.config) if args.config else MachineConfig()
+        except (OSError, ValueError) as e:
+            parser.error(f"invalid --config: {e}")
+        state = ProcessorState(config)
+
+    if args.cache:
+        cache = ResultCache(args.cache, args.cache_size << 20)
+        compress = args.output.endswith(".gz") if args.gzip is None else args.gzip
+        key = cache.trace_key(text, run_options(state.config, args.compact, compress, args.binary, args.engine))
+        if cache.fetch_trace(key, args.output) is not None:
+            logging.info("trace reused from the cache")
+            return
+
+    if args.counters and state.counters is None:
+        state.counters = PerfCounters(state.config)
+    if (args.timeline or args.timeline_chrome) and state.timeline is None:
+        state.timeline = Timeline()
+
+    if args.profile:
+        timer = StageTimer()
+        register_stage_hook(timer)
+    if args.profile_memory:
+        tracker = AllocationTracker()
+        register_stage_hook(tracker)
+        tracker.start()
+
+    # Each cycle is written to the output as soon as it ends
+    if args.binary:
+        writer = BinaryTraceWriter(args.output, state.config.physical_registers, state.config.LOGICAL_REGISTERS)
+    else:
+        writer = TraceWriter(args.output, pretty=not args.compact, compress=args.gzip)
+
+    checkpoint = None
+    try:
+        with writer:
+            trace = writer
+            if args.trace_every is not None:
+                trace = EveryNthCycle(writer, args.trace_every)
+            elif args.trace_window is not None:
+                trace = CycleWindow(writer, *args.trace_window)
+            elif args.trace_ring is not None:
+                trace = EventRing(writer, args.trace_ring, args.trace_on or ["exception"], args.trace_pc, args.trace_after)
+            if args.checkpoint:
+                trace = checkpoint = CheckpointTrace(trace, args.checkpoint_at, args.checkpoint, digest, args.stop)
+
+            first = state.cycle
+            raised = simulate(state, program, trace, args.engine)
+    except StopSimulation:
+        # The writer kept the trace up to the checkpointed cycle
+        logging.info(f"stopped after checkpointing cycle {state.cycle}")
+        return
+    logging.info("end of simulation")
+
+    if checkpoint is not None and not checkpoint.saved:
+        parser.error(f"no checkpoint saved, the simulation ran cycles {first} to {state.cycle} and never reached --checkpoint-at {args.checkpoint_at}")
+
+    if args.cache:
+        cache.store_trace(key, args.output, (functional.architectural_state(state), raised, state.exception_pc if raised else 0))
+        cache.prune()
+
+    if args.profile:
+        print(timer.report())
+    if args.profile_memory:
+        tracker.stop()
+        print(tracker.report())
+
+    if args.counters:
+        print(state.counters.summary())
+        state.counters.write(args.counters)
+
+    if args.timeline:
+        state.timeline.write(args.timeline, program)
+    if args.timeline_chrome:
+        state.timeline.write_chrome(args.timeline_chrome, program)
+
+def simulate(state, program, trace, engine="scalar"):
+    """
+    Runs the program to completion from the given state (initial or restored from a checkpoint),
+    recording the current cycle then every following one in trace
+    The kernel engine runs the cycle loop compiled for the machine parameters (see kernel.py)
+    @return True if the program raised an exception
+    """
+    if STAGE_HOOKS:
+        trace = HookedTrace(trace)
+
+    # Initial state
+    trace.append(state)
 
     # Go through pipeline
-    pipeline(state, instructions, trace)
+    if not (state.exception or state.recovering):
+        if engine == "kernel":
+            run_kernel(state, program, trace)
+        else:
+            pipeline(state, program, trace)
+
+    raised = state.exception or state.recovering
+
+    # Exception handling
+    if(state.exception):
+        hooked("exception", exception_handler)(state, trace)
 
-    # Exception handling 
-    if(state["Exception"]):
-        exception_handler(state, trace)
-        
     # End of simulation
-    if(state["Exception"]):
-        state["Exception"] = False
-        trace.append(copy.deepcopy(state))
-    print("end of simulation")
-
-    # Write output
-    with open(output, "w") as f:
-        json.dump(trace, f, indent=2)
+    if(state.exception):
+        state.exception = False
+        state.cycle += 1
+        trace.append(state)
+
+    return raised
 
 if __name__ == "__main__":
     main()
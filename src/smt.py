@@ -0,0 +1,421 @@
+import argparse
+import heapq
+import json
+from collections import deque
+
+import functional
+from exception_handling.exception_handler import rollback
+from pipeline.config import MachineConfig
+from pipeline.issue_policy import ReadySet
+from pipeline.packed_program import PackedProgram, is_packed_program
+from pipeline.stage0 import decode_program, fetch_and_decode
+from pipeline.stage1 import rename_and_dispatch
+from pipeline.stage2 import issue
+from pipeline.stage34 import execute
+from pipeline.stage5 import commit
+from pipeline.state import ProcessorState
+from simulator import simulate
+from tracing.trace_reader import iter_cycles
+from tracing.trace_writer import CycleCounter, TraceWriter
+
+FETCH_POLICIES = ("round_robin", "icount")
+
+
+class SharedIntegerQueue(dict):
+    """
+    Integer Queue shared by the threads: entry → (dispatch sequence, thread), in dispatch order
+    The stages insert and remove entries as in the ProcessorState's Integer Queue (whose values are None),
+    the entries are tagged with the thread being renamed and the number of entries of each thread is kept (ICOUNT).
+    """
+
+    def __init__(self, threads):
+        super().__init__()
+        self.thread = 0 # Thread whose DIR is being renamed
+        self.sequence = 0
+        self.queued = [0]*threads
+
+    def __setitem__(self, entry, value):
+        super().__setitem__(entry, (self.sequence, self.thread))
+        self.sequence += 1
+        self.queued[self.thread] += 1
+
+    def __delitem__(self, entry):
+        self.queued[self[entry][1]] -= 1
+        super().__delitem__(entry)
+
+
+class SharedReadySet(ReadySet):
+    """
+    Ready entries of the shared Integer Queue, the oldest dispatched first whatever their thread
+    (the PCs of different threads do not tell their age)
+    """
+
+    def __init__(self, integer_queue):
+        super().__init__("oldest")
+        self.integer_queue = integer_queue
+
+    def push(self, entry):
+        heapq.heappush(self.heap, (self.integer_queue[entry][0], entry))
+
+
+class ThreadState:
+    """
+    Hardware thread seen by the stage functions as a ProcessorState: its own PC, DIR, RMT,
+    Active List and exception state, references to the structures shared with the other threads
+    (config, Integer Queue, ready set, wakeup network, register file, BusyBitTable and FreeList)
+    """
+    __slots__ = (
+        "id", "program", "config",
+        "pc", "decoded_instructions", "decoded_pcs", "register_map_table", "active_list",
+        "integer_queue", "ready", "waiting", "physical_register_file", "busy_bit_table", "free_list",
+        "exception", "exception_pc", "recovering", "finished", "committed", "finish_cycle",
+        "cycle", "counters", "timeline"
+    )
+
+    def __init__(self, id, program, register_map_table, core):
+        self.id = id
+        self.program = program
+        self.config = core.config
+        self.pc = 0
+        self.decoded_instructions = [] # DIR
+        self.decoded_pcs = []
+        self.register_map_table = register_map_table
+        self.active_list = deque()
+        self.integer_queue = core.integer_queue
+        self.ready = core.ready
+        self.waiting = core.waiting
+        self.physical_register_file = core.physical_register_file
+        self.busy_bit_table = core.busy_bit_table
+        self.free_list = core.free_list
+        self.exception = False
+        self.exception_pc = 0
+        self.recovering = False # Flushed, rolling its Active List back
+        self.finished = False
+        self.committed = 0
+        self.finish_cycle = 0
+        self.cycle = 0
+        self.counters = None
+        self.timeline = None
+
+    def to_json(self):
+        return {
+            "ActiveList": [entry.to_json() for entry in self.active_list],
+            "DecodedPCs": list(self.decoded_pcs),
+            "Exception": self.exception,
+            "ExceptionPC": self.exception_pc,
+            "PC": self.pc,
+            "RegisterMapTable": list(self.register_map_table)
+        }
+
+
+class SMTState:
+    """
+    Core running one program per hardware thread
+    Shared between the threads: the Integer Queue, the physical register file (PRF, BusyBitTable, FreeList),
+    the issue width and the execute pipeline. Each cycle one thread, chosen by the fetch policy, gets
+    the front end (rename & dispatch of its DIR, then fetch); every thread commits from its own Active List.
+    - round_robin: the threads take turns
+    - icount: the thread with the fewest instructions in its DIR and the Integer Queue
+    Logical register r of thread t starts mapped to physical register 32·t + r.
+    The stages run on the SMTState (execute, issue) or on a ThreadState (commit, rename & dispatch, fetch).
+    """
+
+    def __init__(self, programs, config=None, fetch_policy="icount"):
+        if config is None:
+            config = smt_config(len(programs))
+
+        logical = config.LOGICAL_REGISTERS
+        physical = config.physical_registers
+        count = len(programs)
+
+        if not programs:
+            raise ValueError("SMT needs at least one program")
+        if fetch_policy not in FETCH_POLICIES:
+            raise ValueError(f"Unknown fetch policy: {fetch_policy}")
+        if config.issue_policy != "oldest":
+            raise ValueError("The SMT core only models the oldest-first issue policy")
+        if physical - count * logical < config.fetch_width:
+            raise ValueError(f"Need at least {count * logical + config.fetch_width} physical registers for {count} threads")
+
+        self.config = config
+        self.fetch_policy = fetch_policy
+        self.busy_bit_table = [False]*physical
+        self.physical_register_file = [0]*physical
+        self.free_list = deque(range(count * logical, physical))
+        self.integer_queue = SharedIntegerQueue(count)
+        self.ready = SharedReadySet(self.integer_queue)
+        self.waiting = {} # Wakeup network, as in ProcessorState
+        self.execute_buffer = [[], []]
+        self.cycle = 0
+        self.last_fetched = count - 1 # Round robin starts with thread 0
+        self.counters = None
+        self.timeline = None
+
+        self.threads = [
+            ThreadState(i, program, list(range(i * logical, (i + 1) * logical)), self)
+            for i, program in enumerate(programs)
+        ]
+
+    def to_json(self):
+        """
+        Returns the shared structures and one object per thread, the Integer Queue entries carry their thread
+        """
+        integer_queue = []
+        for entry, (_, thread) in self.integer_queue.items():
+            data = entry.to_json()
+            data["Thread"] = thread
+            integer_queue.append(data)
+
+        return {
+            "BusyBitTable": list(self.busy_bit_table),
+            "FreeList": list(self.free_list),
+            "IntegerQueue": integer_queue,
+            "PhysicalRegisterFile": list(self.physical_register_file),
+            "Threads": [thread.to_json() for thread in self.threads]
+        }
+
+    def architectural_state(self, thread):
+        """
+        Returns the final (registers, exception, exception PC) of a thread, as functional.run_functional does
+        """
+        registers = [self.physical_register_file[p] for p in thread.register_map_table]
+        # A thread that raised stays marked as recovering once its rollback is over
+        return registers, thread.recovering, thread.exception_pc
+
+
+def smt_config(threads):
+    """
+    Returns the reference machine with the physical registers scaled for the threads:
+    the architectural registers of every thread plus the 32 rename registers of the reference core
+    """
+    reference = MachineConfig()
+    return MachineConfig(physical_registers=reference.physical_registers + (threads - 1) * reference.LOGICAL_REGISTERS)
+
+
+def thread_view(cycle, thread):
+    """
+    Returns a cycle of an SMT trace from the point of view of one thread, in the layout of the single-threaded trace
+    """
+    context = cycle["Threads"][thread]
+    return {
+        "ActiveList": context["ActiveList"],
+        "BusyBitTable": cycle["BusyBitTable"],
+        "DecodedPCs": context["DecodedPCs"],
+        "Exception": context["Exception"],
+        "ExceptionPC": context["ExceptionPC"],
+        "FreeList": cycle["FreeList"],
+        "IntegerQueue": [{key: value for key, value in entry.items() if key != "Thread"}
+                         for entry in cycle["IntegerQueue"] if entry["Thread"] == thread],
+        "PC": context["PC"],
+        "PhysicalRegisterFile": cycle["PhysicalRegisterFile"],
+        "RegisterMapTable": context["RegisterMapTable"]
+    }
+
+
+def retire(state, thread):
+    """
+    Commits the thread (see commit), an exception at the head flushes it (see flush),
+    its rollback starts the next cycle
+    """
+    active_list = thread.active_list
+    count = len(active_list)
+
+    if commit(thread):
+        flush(state, thread)
+
+    thread.committed += count - len(active_list)
+
+
+def flush(state, thread):
+    """
+    Removes the in-flight instructions of a thread from the shared structures:
+    its Integer Queue entries, their ready and wakeup records and its issued instructions
+    """
+    integer_queue = state.integer_queue
+    flushed = {entry for entry, (_, owner) in integer_queue.items() if owner == thread.id}
+    for entry in flushed:
+        del integer_queue[entry]
+
+    heap = state.ready.heap
+    heap[:] = [item for item in heap if item[-1] not in flushed]
+    heapq.heapify(heap)
+
+    for tag in list(state.waiting):
+        entries = [entry for entry in state.waiting[tag] if entry not in flushed]
+        if entries:
+            state.waiting[tag] = entries
+        else:
+            del state.waiting[tag]
+
+    own = {id(entry) for entry in thread.active_list}
+    state.execute_buffer = [[inst for inst in issued if id(inst.active_entry) not in own] for issued in state.execute_buffer]
+
+    thread.recovering = True
+
+
+def recover(state, thread):
+    """
+    One cycle of the exception handler for a flushed thread (see rollback),
+    once its Active List is empty the thread leaves the exception state and ends
+    """
+    if not thread.active_list:
+        thread.exception = False
+        thread.finished = True
+        thread.finish_cycle = state.cycle + 1
+        return
+
+    rollback(thread)
+
+
+def select_thread(state):
+    """
+    Returns the thread getting the front end this cycle, None if no thread has instructions to rename or fetch
+    """
+    count = len(state.threads)
+    order = [state.threads[(state.last_fetched + 1 + i) % count] for i in range(count)]
+    candidates = [thread for thread in order
+                  if not (thread.finished or thread.recovering)
+                  and (thread.decoded_instructions or thread.pc < len(thread.program))]
+    if not candidates:
+        return None
+
+    if state.fetch_policy == "icount":
+        # min keeps the first of the equal counts: ties go round robin
+        queued = state.integer_queue.queued
+        return min(candidates, key=lambda thread: len(thread.decoded_instructions) + queued[thread.id])
+    return candidates[0]
+
+
+def front_end(state):
+    """
+    Renames the DIR of the selected thread then, once it is empty, fetches its next group
+    (a group that does not fit stays in the DIR)
+    """
+    thread = select_thread(state)
+    if thread is None:
+        return
+    state.last_fetched = thread.id
+
+    state.integer_queue.thread = thread.id
+    DIR = rename_and_dispatch(thread, thread.decoded_instructions)
+    if not DIR:
+        DIR = fetch_and_decode(thread, thread.program)
+    thread.decoded_instructions = DIR
+
+
+def simulate_smt(state, trace):
+    """
+    Runs every thread to completion, recording the initial state then every cycle in trace
+    A thread ends when its program is done, or after the rollback of its exception. The others keep running.
+    """
+    trace.append(state)
+
+    while True:
+        for thread in state.threads:
+            if not (thread.finished or thread.recovering or thread.pc < len(thread.program)
+                    or thread.decoded_instructions or thread.active_list):
+                thread.finished = True
+                thread.finish_cycle = state.cycle
+        if all(thread.finished for thread in state.threads):
+            break
+
+        for thread in state.threads:
+            if thread.recovering:
+                if not thread.finished:
+                    recover(state, thread)
+            elif not thread.finished:
+                retire(state, thread)
+
+        execute(state, state.execute_buffer[1])
+        state.execute_buffer = [issue(state), state.execute_buffer[0]]
+        front_end(state)
+
+        state.cycle += 1
+        trace.append(state)
+
+
+def load_program(path):
+    """
+    Decodes an input.json, or opens a program packed by assembler.py
+    """
+    if is_packed_program(path):
+        return PackedProgram(path)
+    with open(path) as f:
+        return decode_program(json.load(f))
+
+
+def report(state, programs):
+    """
+    Per-thread and aggregate IPC, against each program run alone on the same core,
+    and the check of each thread's final architectural state against the functional mode
+    @return (report lines, True if every thread matches)
+    """
+    cycles = state.cycle
+    lines = [f"{'thread':6s} {'committed':>9s} {'cycles':>7s} {'IPC':>6s} {'alone':>7s} {'IPC':>6s}  functional"]
+    alone_total = 0
+    correct = True
+
+    for thread, program in zip(state.threads, programs):
+        alone = ProcessorState(state.config)
+        counter = CycleCounter()
+        simulate(alone, program, counter)
+        alone_cycles = len(counter) - 1
+        alone_total += alone_cycles
+
+        matches = state.architectural_state(thread) == functional.run_functional(program)
+        correct = correct and matches
+
+        ipc = thread.committed / thread.finish_cycle if thread.finish_cycle else 0.0
+        alone_ipc = thread.committed / alone_cycles if alone_cycles else 0.0
+        lines.append(f"{thread.id:6d} {thread.committed:9d} {thread.finish_cycle:7d} {ipc:6.3f} {alone_cycles:7d} {alone_ipc:6.3f}  "
+                     f"{'OK' if matches else 'MISMATCH'}")
+
+    committed = sum(thread.committed for thread in state.threads)
+    lines.append(f"Aggregate: {committed} instructions in {cycles} cycles, IPC {committed / cycles if cycles else 0.0:.3f}")
+    lines.append(f"Throughput gain over running the programs one after the other: {alone_total / cycles if cycles else 0.0:.2f}x")
+    return lines, correct
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simultaneous multithreading: one program per hardware thread on a core sharing the Integer Queue, the register file and the issue width")
+    parser.add_argument("programs", nargs="+", help="One program per thread (input.json, or packed by assembler.py).")
+    parser.add_argument("--output", "-o", help="Write the SMT trace (shared structures plus one object per thread) to this file.")
+    parser.add_argument("--split", action="store_true", help="Also write the trace of each thread in the single-threaded layout, next to --output (.t0.json, .t1.json...).")
+    parser.add_argument("--compact", action="store_true", help="Write the traces without indentation.")
+    parser.add_argument("--config", help="Machine parameters (JSON object), defaults to the reference 4-wide core with 32 more physical registers per additional thread.")
+    parser.add_argument("--fetch-policy", choices=FETCH_POLICIES, default="icount", help="The thread getting the front end each cycle.")
+    args = parser.parse_args()
+
+    if args.split and not args.output:
+        parser.error("--split needs --output")
+
+    try:
+        config = MachineConfig.from_json(args.config) if args.config else smt_config(len(args.programs))
+    except (OSError, ValueError) as e:
+        parser.error(f"invalid --config: {e}")
+    programs = [load_program(path) for path in args.programs]
+    try:
+        state = SMTState(programs, config, args.fetch_policy)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.output:
+        with TraceWriter(args.output, pretty=not args.compact) as trace:
+            simulate_smt(state, trace)
+    else:
+        simulate_smt(state, CycleCounter())
+
+    if args.split:
+        base = args.output[:-5] if args.output.endswith(".json") else args.output
+        for thread in range(len(programs)):
+            with TraceWriter(f"{base}.t{thread}.json", pretty=not args.compact) as writer:
+                for cycle in iter_cycles(args.output):
+                    writer.append_json(thread_view(cycle, thread))
+
+    lines, correct = report(state, programs)
+    print("\n".join(lines))
+    return 0 if correct else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,273 @@
+import argparse
+import json
+
+from pipeline.stage0 import parse_instruction
+
+EVENTS = ("Fetch", "Dispatch", "Issue", "Complete", "Commit", "Squash")
+FETCH, DISPATCH, ISSUE, COMPLETE, COMMIT, SQUASH = range(len(EVENTS))
+
+# Time spent by an instruction between two events
+STAGES = (
+    ("Decode", FETCH, DISPATCH),
+    ("Queue", DISPATCH, ISSUE),
+    ("Execute", ISSUE, COMPLETE),
+    ("Retire", COMPLETE, COMMIT)
+)
+
+
+class Timeline:
+    """
+    Per-instruction lifecycle: the cycle each PC was fetched, dispatched, issued, completed,
+    committed or squashed by the exception handler
+    A cycle is the index of the first trace entry showing the event.
+    Attached to state.timeline only when requested, the stages skip it when it is None.
+    """
+
+    def __init__(self):
+        self.records = {} # PC → cycle of each event (None until it happens)
+        self.exceptions = set() # PCs whose execution raised
+
+    def fetch(self, pcs, cycle):
+        for pc in pcs:
+            self.records[pc] = [cycle, None, None, None, None, None]
+
+    def dispatch(self, instructions, cycle):
+        for inst in instructions:
+            self.records[inst.pc][DISPATCH] = cycle
+
+    def issue(self, entries, cycle):
+        for entry in entries:
+            self.records[entry.pc][ISSUE] = cycle
+
+    def complete(self, entries, cycle):
+        for entry in entries:
+            self.records[entry.pc][COMPLETE] = cycle
+            if entry.active_entry.exception:
+                self.exceptions.add(entry.pc)
+
+    def commit(self, pc, cycle):
+        self.records[pc][COMMIT] = cycle
+
+    def squash(self, pcs, cycle):
+        for pc in pcs:
+            self.records[pc][SQUASH] = cycle
+
+    def to_json(self, program):
+        """
+        Returns the per-instruction table: one row per fetched PC, in program order
+        """
+        rows = []
+        for pc in sorted(self.records):
+            rows.append([pc, instruction_text(program[pc]), *self.records[pc], pc in self.exceptions])
+
+        return {
+            "Columns": ["PC", "Instruction", *EVENTS, "Exception"],
+            "Rows": rows
+        }
+
+    def write(self, path, program):
+        with open(path, "w") as f:
+            json.dump(self.to_json(program), f, separators=(",", ":"))
+
+    def write_chrome(self, path, program):
+        with open(path, "w") as f:
+            json.dump(chrome_trace(self.to_json(program)), f, separators=(",", ":"))
+
+
+def instruction_text(inst):
+    if inst.rs2 is None:
+        return f"addi x{inst.rd}, x{inst.rs1}, {inst.imm}"
+    return f"{inst.opcode} x{inst.rd}, x{inst.rs1}, x{inst.rs2}"
+
+
+def load_table(path):
+    """
+    Reads a table written by Timeline.write, rows become dicts keyed by column
+    """
+    with open(path) as f:
+        table = json.load(f)
+    return [dict(zip(table["Columns"], row)) for row in table["Rows"]]
+
+
+def chrome_trace(table):
+    """
+    Converts the table to the Trace Event Format (chrome://tracing, Perfetto):
+    one track per instruction, one slice per stage, 1 µs per cycle
+    """
+    columns = table["Columns"]
+    events = []
+
+    for row in table["Rows"]:
+        record = dict(zip(columns, row))
+        pc = record["PC"]
+        cycles = [record[event] for event in EVENTS]
+
+        events.append({"ph": "M", "name": "thread_name", "pid": 0, "tid": pc,
+                       "args": {"name": f"{pc}: {record['Instruction']}"}})
+        events.append({"ph": "M", "name": "thread_sort_index", "pid": 0, "tid": pc, "args": {"sort_index": pc}})
+
+        for name, start, end in STAGES:
+            begin = cycles[start]
+            finish = cycles[end] if cycles[end] is not None else cycles[SQUASH]
+            if begin is not None and finish is not None:
+                events.append({"ph": "X", "name": name, "pid": 0, "tid": pc, "ts": begin, "dur": finish - begin,
+                               "args": {"exception": record["Exception"]} if name == "Execute" else {}})
+
+        if cycles[SQUASH] is not None:
+            events.append({"ph": "i", "s": "t", "name": "Squash", "pid": 0, "tid": pc, "ts": cycles[SQUASH]})
+
+    return {"traceEvents": events, "displayTimeUnit": "ns", "otherData": {"unit": "1 us = 1 cycle"}}
+
+
+def distribution(values):
+    """
+    Count, mean, percentiles and histogram of a list of latencies
+    """
+    values = sorted(values)
+    if not values:
+        return {"Count": 0}
+
+    histogram = {}
+    for value in values:
+        histogram[value] = histogram.get(value, 0) + 1
+
+    def percentile(p):
+        return values[min(len(values) - 1, int(p * len(values)))]
+
+    return {
+        "Count": len(values),
+        "Mean": sum(values) / len(values),
+        "P50": percentile(0.5),
+        "P90": percentile(0.9),
+        "P99": percentile(0.99),
+        "Max": values[-1],
+        "Histogram": histogram
+    }
+
+
+def latencies(records):
+    """
+    Latency distribution of each stage, and from fetch to commit, over the committed instructions
+    """
+    committed = [r for r in records if r["Commit"] is not None]
+    result = {name: distribution([r[EVENTS[end]] - r[EVENTS[start]] for r in committed])
+              for name, start, end in STAGES}
+    result["Total"] = distribution([r["Commit"] - r["Fetch"] for r in committed])
+    return result
+
+
+def critical_path(records):
+    """
+    Walks back from the last instruction to finish, following at each step the operand that arrived last
+    The walk stops at an instruction whose operands were all ready when it was dispatched: from there
+    the front end (fetch, dispatch) limited it, not a dependency.
+    Each step reports the cycles the instruction waited for its operands after dispatch (dependency)
+    and for an issue slot once they were ready (contention).
+    @return the path, oldest first
+    """
+    finished = [r for r in records if r["Complete"] is not None]
+    if not finished:
+        return []
+
+    # The producer of an operand is the last older instruction writing its register
+    producers = {}
+    writers = {}
+    for record in sorted(records, key=lambda r: r["PC"]):
+        inst = parse_instruction(record["Instruction"], record["PC"])
+        producers[record["PC"]] = [writers[source] for source in (inst.rs1, inst.rs2)
+                                   if source in writers and writers[source]["Complete"] is not None]
+        writers[inst.rd] = record
+
+    current = max(finished, key=lambda r: (r["Commit"] if r["Commit"] is not None else r["Complete"], r["PC"]))
+    path = []
+
+    while current is not None:
+        # Issue is possible the cycle after dispatch, or the cycle a producer completes (forwarding)
+        ready = current["Dispatch"] + 1
+        producer = max(producers[current["PC"]], key=lambda r: r["Complete"], default=None)
+        if producer is not None and producer["Complete"] > ready:
+            ready = producer["Complete"]
+        else:
+            producer = None
+
+        path.append({
+            "PC": current["PC"],
+            "Instruction": current["Instruction"],
+            "Fetch": current["Fetch"],
+            "Dispatch": current["Dispatch"],
+            "Issue": current["Issue"],
+            "Complete": current["Complete"],
+            "Commit": current["Commit"],
+            "Dependency": ready - current["Dispatch"] - 1,
+            "Contention": current["Issue"] - ready
+        })
+        current = producer
+
+    path.reverse()
+    return path
+
+
+def report(records, top=10):
+    """
+    Human readable latency distributions and critical path
+    """
+    lines = []
+    squashed = sum(r["Squash"] is not None for r in records)
+    committed = sum(r["Commit"] is not None for r in records)
+    lines.append(f"Instructions: {len(records)} fetched, {committed} committed, {squashed} squashed")
+
+    lines.append("")
+    lines.append(f"{'latency':8s} {'count':>6s} {'mean':>7s} {'p50':>5s} {'p90':>5s} {'p99':>5s} {'max':>5s}")
+    for name, stats in latencies(records).items():
+        if stats["Count"]:
+            lines.append(f"{name:8s} {stats['Count']:6d} {stats['Mean']:7.2f} {stats['P50']:5d} {stats['P90']:5d} {stats['P99']:5d} {stats['Max']:5d}")
+
+    path = critical_path(records)
+    if path:
+        first, last = path[0], path[-1]
+        end = last["Commit"] if last["Commit"] is not None else last["Complete"]
+        lines.append("")
+        lines.append(f"Critical path: {len(path)} instructions, cycles {first['Fetch']} to {end}")
+        # Along the path the spans follow each other, they add up to its length
+        lines.append(f"  front end (fetch to dispatch of the first): {first['Dispatch'] - first['Fetch']}")
+        lines.append(f"  dispatch to issue of the first: {first['Issue'] - first['Dispatch']}")
+        lines.append(f"  waiting for an issue slot once an operand arrived: {sum(step['Contention'] for step in path[1:])}")
+        lines.append(f"  executing: {sum(step['Complete'] - step['Issue'] for step in path)}")
+        if last["Commit"] is not None:
+            lines.append(f"  retiring (last completion to commit): {last['Commit'] - last['Complete']}")
+
+        lines.append(f"  {'PC':>5s}  {'instruction':24s} {'fetch':>5s} {'disp':>5s} {'issue':>5s} {'done':>5s} {'dep':>4s} {'cont':>4s}")
+        shown = path if len(path) <= 2 * top else path[:top] + [None] + path[-top:]
+        for step in shown:
+            if step is None:
+                lines.append(f"  {'...':>5s}")
+                continue
+            lines.append(f"  {step['PC']:5d}  {step['Instruction']:24s} {step['Fetch']:5d} {step['Dispatch']:5d} "
+                         f"{step['Issue']:5d} {step['Complete']:5d} {step['Dependency']:4d} {step['Contention']:4d}")
+
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency distributions and critical dependency path of a lifecycle table (simulator.py --timeline)")
+    parser.add_argument("table", help="The table written by simulator.py --timeline.")
+    parser.add_argument("--top", type=int, default=10, help="Steps of the critical path shown at each end.")
+    parser.add_argument("--json", help="Also write the distributions and the critical path to this JSON file.")
+    parser.add_argument("--chrome", help="Convert the table to the Trace Event Format (chrome://tracing, Perfetto) in this file.")
+    args = parser.parse_args()
+
+    records = load_table(args.table)
+    print(report(records, args.top))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"Latencies": latencies(records), "CriticalPath": critical_path(records)}, f, indent=2)
+    if args.chrome:
+        with open(args.table) as f:
+            table = json.load(f)
+        with open(args.chrome, "w") as f:
+            json.dump(chrome_trace(table), f, separators=(",", ":"))
+
+
+if __name__ == "__main__":
+    main()
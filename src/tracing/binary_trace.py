@@ -0,0 +1,260 @@
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+
+from checkpoint import StopSimulation
+
+MAGIC = b"OOOTRACE"
+VERSION = 1
+
+# Magic, version, physical registers, logical registers, cycles, then the offsets of the sections
+HEADER = struct.Struct("<8sIIIQ6Q")
+SECTIONS = ("scalars", "busy", "registers", "map", "index", "records")
+
+# Fixed-size columns, one row per cycle
+SCALARS = struct.Struct("<qqB") # PC, ExceptionPC, Exception
+
+# Variable-length record of a cycle: the counts, then the DecodedPCs, the FreeList, the Active List and the Integer Queue
+COUNTS = struct.Struct("<IIII")
+ACTIVE_LIST_ENTRY = struct.Struct("<BIIq") # Done | Exception << 1, LogicalDestination, OldDestination, PC
+INTEGER_QUEUE_ENTRY = struct.Struct("<IBIQIQqB") # DestRegister, flags, OpARegTag, OpAValue, OpBRegTag, OpBValue, PC, OpCode
+
+OPCODES = ("add", "addi", "sub", "mulu", "divu", "remu")
+OPCODE_INDEX = {opcode: i for i, opcode in enumerate(OPCODES)}
+
+A_READY = 1
+B_READY = 2
+B_NEGATIVE = 4 # OpBValue holds a negative immediate (stored as its u64 two's complement)
+
+MASK = 0xFFFFFFFFFFFFFFFF
+
+
+class BinaryTraceWriter:
+    """
+    Trace sink writing the binary columnar format
+    - BusyBitTable (one byte per register), PhysicalRegisterFile (u64) and RegisterMapTable (u32)
+      are packed columns: cycle i is at a fixed offset
+    - DecodedPCs, FreeList, ActiveList and IntegerQueue are variable-length records located by an offset index
+    Each column is streamed to a temporary file next to the output and they are concatenated on close.
+    """
+
+    def __init__(self, path, physical, logical):
+        self.path = path
+        self.physical = physical
+        self.logical = logical
+        self.count = 0
+        self.records_size = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        self.columns = {section: tempfile.TemporaryFile(dir=directory) for section in SECTIONS}
+
+        self.busy = struct.Struct(f"{physical}?")
+        self.registers = struct.Struct(f"<{physical}Q")
+        self.map = struct.Struct(f"<{logical}I")
+
+    def __len__(self):
+        return self.count
+
+    def append(self, state):
+        """
+        Writes the state at the end of a cycle
+        """
+        active_list = [(entry.done | entry.exception << 1, entry.logical_destination, entry.old_destination, entry.pc)
+                       for entry in state.active_list]
+        integer_queue = [(entry.dest_register, entry.op_a_is_ready, entry.op_a_reg_tag, entry.op_a_value,
+                          entry.op_b_is_ready, entry.op_b_reg_tag, entry.op_b_value, entry.pc, entry.opcode)
+                         for entry in state.integer_queue]
+
+        self.write(state.pc, state.exception_pc, state.exception, state.busy_bit_table, state.physical_register_file,
+                   state.register_map_table, state.decoded_pcs, state.free_list, active_list, integer_queue)
+
+    def append_json(self, cycle):
+        """
+        Writes a cycle in the layout of the JSON trace
+        """
+        active_list = [(entry["Done"] | entry["Exception"] << 1, entry["LogicalDestination"], entry["OldDestination"], entry["PC"])
+                       for entry in cycle["ActiveList"]]
+        integer_queue = [(entry["DestRegister"], entry["OpAIsReady"], entry["OpARegTag"], entry["OpAValue"],
+                          entry["OpBIsReady"], entry["OpBRegTag"], entry["OpBValue"], entry["PC"], entry["OpCode"])
+                         for entry in cycle["IntegerQueue"]]
+
+        self.write(cycle["PC"], cycle["ExceptionPC"], cycle["Exception"], cycle["BusyBitTable"], cycle["PhysicalRegisterFile"],
+                   cycle["RegisterMapTable"], cycle["DecodedPCs"], cycle["FreeList"], active_list, integer_queue)
+
+    def write(self, pc, exception_pc, exception, busy_bit_table, physical_register_file, register_map_table,
+              decoded_pcs, free_list, active_list, integer_queue):
+        columns = self.columns
+
+        columns["scalars"].write(SCALARS.pack(pc, exception_pc, exception))
+        columns["busy"].write(self.busy.pack(*busy_bit_table))
+        columns["registers"].write(self.registers.pack(*physical_register_file))
+        columns["map"].write(self.map.pack(*register_map_table))
+
+        record = [
+            COUNTS.pack(len(decoded_pcs), len(free_list), len(active_list), len(integer_queue)),
+            struct.pack(f"<{len(decoded_pcs)}q", *decoded_pcs),
+            struct.pack(f"<{len(free_list)}I", *free_list)
+        ]
+        for entry in active_list:
+            record.append(ACTIVE_LIST_ENTRY.pack(*entry))
+        for dest, a_ready, a_tag, a_value, b_ready, b_tag, b_value, entry_pc, opcode in integer_queue:
+            flags = a_ready | b_ready << 1 | (b_value < 0) << 2
+            record.append(INTEGER_QUEUE_ENTRY.pack(dest, flags, a_tag, a_value, b_tag, b_value & MASK, entry_pc, OPCODE_INDEX[opcode]))
+        record = b"".join(record)
+
+        columns["index"].write(struct.pack("<Q", self.records_size))
+        columns["records"].write(record)
+        self.records_size += len(record)
+        self.count += 1
+
+    def close(self):
+        """
+        Writes the header followed by the sections
+        """
+        columns = self.columns
+        # The index has one more entry: the end of the last record
+        columns["index"].write(struct.pack("<Q", self.records_size))
+
+        offsets = []
+        position = HEADER.size
+        for section in SECTIONS:
+            offsets.append(position)
+            position += columns[section].tell()
+
+        with open(self.path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.physical, self.logical, self.count, *offsets))
+            for section in SECTIONS:
+                columns[section].seek(0)
+                shutil.copyfileobj(columns[section], f)
+        self.discard()
+
+    def discard(self):
+        for column in self.columns.values():
+            column.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None or issubclass(exc_type, StopSimulation):
+            self.close()
+        else:
+            # Nothing is written to the output before close
+            self.discard()
+
+
+class BinaryTrace:
+    """
+    Random access reader of a binary trace
+    The file is memory mapped, reading a cycle only touches its rows and record.
+    trace[i] returns cycle i in the layout of the JSON trace.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.map[:len(MAGIC)] != MAGIC:
+            self.map.close()
+            raise ValueError(f"Not a binary trace: {path}")
+
+        magic, version, physical, logical, count, *offsets = HEADER.unpack_from(self.map)
+        if version != VERSION:
+            self.map.close()
+            raise ValueError(f"Unsupported binary trace version: {version}")
+
+        self.physical = physical
+        self.logical = logical
+        self.count = count
+        self.offsets = dict(zip(SECTIONS, offsets))
+
+        self.busy = struct.Struct(f"{physical}?")
+        self.registers = struct.Struct(f"<{physical}Q")
+        self.register_map = struct.Struct(f"<{logical}I")
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError("cycle out of range")
+
+        data = self.map
+        offsets = self.offsets
+
+        pc, exception_pc, exception = SCALARS.unpack_from(data, offsets["scalars"] + i * SCALARS.size)
+        busy_bit_table = self.busy.unpack_from(data, offsets["busy"] + i * self.busy.size)
+        physical_register_file = self.registers.unpack_from(data, offsets["registers"] + i * self.registers.size)
+        register_map_table = self.register_map.unpack_from(data, offsets["map"] + i * self.register_map.size)
+
+        position = offsets["records"] + struct.unpack_from("<Q", data, offsets["index"] + 8 * i)[0]
+        decoded, free, active, queued = COUNTS.unpack_from(data, position)
+        position += COUNTS.size
+
+        decoded_pcs = struct.unpack_from(f"<{decoded}q", data, position)
+        position += 8 * decoded
+        free_list = struct.unpack_from(f"<{free}I", data, position)
+        position += 4 * free
+
+        active_list = []
+        for _ in range(active):
+            flags, logical, old, entry_pc = ACTIVE_LIST_ENTRY.unpack_from(data, position)
+            position += ACTIVE_LIST_ENTRY.size
+            active_list.append({
+                "Done": bool(flags & 1),
+                "Exception": bool(flags & 2),
+                "LogicalDestination": logical,
+                "OldDestination": old,
+                "PC": entry_pc
+            })
+
+        integer_queue = []
+        for _ in range(queued):
+            dest, flags, a_tag, a_value, b_tag, b_value, entry_pc, opcode = INTEGER_QUEUE_ENTRY.unpack_from(data, position)
+            position += INTEGER_QUEUE_ENTRY.size
+            integer_queue.append({
+                "DestRegister": dest,
+                "OpAIsReady": bool(flags & A_READY),
+                "OpARegTag": a_tag,
+                "OpAValue": a_value,
+                "OpBIsReady": bool(flags & B_READY),
+                "OpBRegTag": b_tag,
+                "OpBValue": b_value - (1 << 64) if flags & B_NEGATIVE else b_value,
+                "OpCode": OPCODES[opcode],
+                "PC": entry_pc
+            })
+
+        return {
+            "ActiveList": active_list,
+            "BusyBitTable": list(busy_bit_table),
+            "DecodedPCs": list(decoded_pcs),
+            "Exception": bool(exception),
+            "ExceptionPC": exception_pc,
+            "FreeList": list(free_list),
+            "IntegerQueue": integer_queue,
+            "PC": pc,
+            "PhysicalRegisterFile": list(physical_register_file),
+            "RegisterMapTable": list(register_map_table)
+        }
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+    def close(self):
+        self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+
+def is_binary_trace(path):
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
@@ -0,0 +1,120 @@
+import gzip
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+from array import array
+
+from tracing.trace_reader import scan_cycles
+
+MAGIC = b"OOOTRIDX"
+
+# Magic, size and modification time of the indexed file, number of cycles
+HEADER = struct.Struct("<8sQQQ")
+
+# Separators between the cycles, stripped from the end of a raw cycle
+SEPARATORS = b", \t\r\n"
+
+
+def build_index(path):
+    """
+    Scans a JSON trace once and returns the offset of each cycle, followed by the end of the last one
+    """
+    offsets = array("Q")
+    end = 0
+    for offset, raw, _ in scan_cycles(path):
+        offsets.append(offset)
+        end = offset + len(raw)
+    offsets.append(end)
+    return offsets
+
+
+def load_index(path, index_path):
+    """
+    Reads the index saved for a trace, None if it is missing or the trace changed since
+    """
+    stat = os.stat(path)
+    try:
+        with open(index_path, "rb") as f:
+            magic, size, mtime, count = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or size != stat.st_size or mtime != stat.st_mtime_ns:
+                return None
+            offsets = array("Q")
+            offsets.fromfile(f, count + 1)
+    except (OSError, EOFError, struct.error):
+        return None
+    return offsets
+
+
+def save_index(path, index_path, offsets):
+    stat = os.stat(path)
+    os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+    temporary = index_path + ".tmp"
+    with open(temporary, "wb") as f:
+        f.write(HEADER.pack(MAGIC, stat.st_size, stat.st_mtime_ns, len(offsets) - 1))
+        offsets.tofile(f)
+    os.replace(temporary, index_path)
+
+
+class IndexedTrace:
+    """
+    Random access reader of a JSON trace (plain or gzip)
+    The trace is scanned once to record the offset of every cycle, the index is saved to index_path
+    and reused while the trace is unchanged. The text is memory mapped, reading a cycle only touches
+    its own bytes. A gzip trace cannot be seeked, it is decompressed to a temporary file first.
+    trace.raw(i, count) returns the JSON text of count cycles, trace[i] parses cycle i.
+    """
+
+    def __init__(self, path, index_path=None):
+        self.path = path
+        self.temporary = None
+
+        with open(path, "rb") as f:
+            compressed = f.read(2) == b"\x1f\x8b"
+        if compressed:
+            fd, self.temporary = tempfile.mkstemp(suffix=".json")
+            with os.fdopen(fd, "wb") as dst, gzip.open(path, "rb") as src:
+                shutil.copyfileobj(src, dst)
+
+        self.offsets = load_index(path, index_path) if index_path else None
+        if self.offsets is None:
+            self.offsets = build_index(self.temporary or path)
+            if index_path:
+                save_index(path, index_path, self.offsets)
+
+        with open(self.temporary or path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def raw(self, i, count=1):
+        """
+        Returns the JSON text of cycles i to i + count - 1, as a JSON list
+        """
+        end = min(i + count, len(self))
+        if not 0 <= i < end:
+            raise IndexError("cycle out of range")
+
+        offsets = self.offsets
+        cycles = [self.map[offsets[j]:offsets[j + 1]].rstrip(SEPARATORS) for j in range(i, end)]
+        return b"[" + b",".join(cycles) + b"]"
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        return json.loads(self.raw(i))[0]
+
+    def close(self):
+        self.map.close()
+        if self.temporary is not None:
+            os.remove(self.temporary)
+            self.temporary = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
@@ -0,0 +1,156 @@
+from tracing.trace_recorder import TraceRecorder
+
+EVENTS = ("exception", "stall", "commit")
+
+# Rings up to SHORT_RING cycles copy the fields of every cycle, diffing costs more than copying.
+# Longer rings are delta-encoded to bound their memory.
+SHORT_RING = 256
+KEYFRAME_INTERVAL = 64
+
+
+def numbered(state):
+    """
+    Returns the state in the layout of the trace with its cycle number,
+    the recorded cycles are not consecutive anymore
+    """
+    cycle = state.to_json()
+    cycle["Cycle"] = state.cycle
+    return dict(sorted(cycle.items()))
+
+
+def oldest_pc(state):
+    """
+    Returns the PC of the oldest instruction not committed yet: the head of the Active List,
+    else the first instruction of the DIR, else the next one to fetch
+    """
+    if state.active_list:
+        return state.active_list[0].pc
+    if state.decoded_pcs:
+        return state.decoded_pcs[0]
+    return state.pc
+
+
+class EveryNthCycle:
+    """
+    Trace sink wrapper recording one cycle out of every n (cycles 0, n, 2n...)
+    """
+
+    def __init__(self, trace, n):
+        if n < 1:
+            raise ValueError("The recording period must be at least 1 cycle")
+        self.trace = trace
+        self.n = n
+
+    def __len__(self):
+        return len(self.trace)
+
+    def append(self, state):
+        if state.cycle % self.n == 0:
+            self.trace.append_json(numbered(state))
+
+
+class CycleWindow:
+    """
+    Trace sink wrapper recording the cycles first to last (inclusive)
+    """
+
+    def __init__(self, trace, first, last):
+        if not 0 <= first <= last:
+            raise ValueError(f"Invalid cycle window: [{first}, {last}]")
+        self.trace = trace
+        self.first = first
+        self.last = last
+
+    def __len__(self):
+        return len(self.trace)
+
+    def append(self, state):
+        if self.first <= state.cycle <= self.last:
+            self.trace.append_json(numbered(state))
+
+
+class EventRing:
+    """
+    Trace sink wrapper keeping the last size cycles in a ring buffer, written out when an event fires
+    - exception: the exception raised in commit reaches the handler
+    - stall: rename refused the fetch group (it is still in the DIR the next cycle)
+    - commit: the instruction at pc committed
+    The after cycles following an event are recorded as well. The ring is a TraceRecorder holding
+    copies of the state fields as keyframes plus deltas, the cycles are only serialized when an event fires.
+    """
+
+    def __init__(self, trace, size, events, pc=None, after=0):
+        for event in events:
+            if event not in EVENTS:
+                raise ValueError(f"Unknown trace event: {event}")
+        if "commit" in events and pc is None:
+            raise ValueError("The commit event needs the PC to watch")
+        if size < 1:
+            raise ValueError("The ring buffer holds at least 1 cycle")
+
+        self.trace = trace
+        self.buffer = TraceRecorder(1 if size <= SHORT_RING else KEYFRAME_INTERVAL)
+        self.size = size
+        self.limit = 2 * size + self.buffer.keyframe_interval # Length at which the oldest cycles are dropped
+        self.events = set(events)
+        self.pc = pc
+        self.after = after
+        self.remaining = 0 # Cycles still to record after the last event
+        self.fired = 0
+
+        # What the events compare against
+        self.exception = False
+        self.decoded_pcs = []
+        self.frontier = None # PC of the oldest instruction not committed yet
+
+    def __len__(self):
+        return len(self.trace)
+
+    def append(self, state):
+        if self.triggered(state):
+            self.fired += 1
+            # The buffered cycles, then the one that fired
+            buffer = self.buffer
+            buffer.append(state)
+            start = max(0, len(buffer) - self.size - 1)
+            for i, cycle in enumerate(buffer):
+                if i >= start:
+                    cycle["Cycle"] = buffer.cycles[i]
+                    self.trace.append_json(dict(sorted(cycle.items())))
+            buffer.clear()
+            self.remaining = self.after
+        elif self.remaining:
+            self.trace.append_json(numbered(state))
+            self.remaining -= 1
+        else:
+            self.buffer.append(state)
+            if len(self.buffer) >= self.limit:
+                self.buffer.trim(self.size)
+
+    def triggered(self, state):
+        fired = False
+
+        if "exception" in self.events:
+            fired = state.exception and not self.exception
+            self.exception = state.exception
+
+        if "stall" in self.events:
+            # PCs only move forward, the same non-empty group twice in a row is a group rename refused
+            decoded_pcs = state.decoded_pcs
+            if decoded_pcs and decoded_pcs == self.decoded_pcs and not (state.exception or state.recovering):
+                fired = True
+            self.decoded_pcs = list(decoded_pcs)
+
+        if "commit" in self.events:
+            if state.recovering:
+                # The exception handler squashes the Active List, nothing commits anymore
+                self.frontier = None
+            else:
+                # Instructions commit in program order from the head of the Active List:
+                # the watched PC committed when the oldest instruction not committed yet moved past it
+                frontier = oldest_pc(state)
+                if self.frontier is not None and self.frontier <= self.pc < frontier:
+                    fired = True
+                self.frontier = frontier
+
+        return fired
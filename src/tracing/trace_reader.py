@@ -0,0 +1,164 @@
+import gzip
+import json
+import re
+
+CHUNK_SIZE = 1 << 20
+
+# Whitespace and separators between the cycles of the top-level array
+SEPARATORS = re.compile(rb'[\s,]*')
+
+# First key of every cycle, the cycles of a trace are found without decoding them (see scan_runs)
+CYCLE_KEY = b'"ActiveList"'
+
+# Longest JSON token that can be cut by the end of a chunk without an "Unterminated string" error (false, \uXXXX)
+TOKEN_SIZE = 6
+
+
+def open_trace(path, mode="rt"):
+    """
+    Opens a trace file, gzip compressed traces are detected by their magic number
+    """
+    with open(path, "rb") as f:
+        compressed = f.read(2) == b"\x1f\x8b"
+    return gzip.open(path, mode) if compressed else open(path, mode)
+
+
+def scan_cycles(path, start=0):
+    """
+    Yields (offset, raw JSON bytes, parsed cycle) for each cycle of a trace, reading the file by chunks
+    The file is read in binary, the offset is the byte offset of the cycle in the (decompressed) file.
+    Only the chunk holding the current cycle is kept in memory, a cycle that does not decode raises
+    ValueError right away (a cycle cut by the end of the chunk is completed with the next one).
+    A non-zero start resumes the scan at that offset, which must be between two cycles (see scan_runs).
+    """
+    decoder = json.JSONDecoder()
+
+    with open_trace(path, "rb") as f:
+        if start:
+            f.seek(start)
+        data = f.read(CHUNK_SIZE)
+        eof = not data
+        base = start # Offset of the buffer in the file
+        # The traces are ASCII (json.dumps escapes the rest), latin-1 maps each byte to one character
+        # so the positions in the text are the positions in the bytes
+        text = data.decode("latin-1")
+
+        pos = SEPARATORS.match(data).end()
+        if not start:
+            if data[pos:pos + 1] != b"[":
+                raise ValueError(f"The trace must be a JSON list: {path}")
+            pos += 1
+
+        while True:
+            pos = SEPARATORS.match(data, pos).end()
+
+            if pos < len(data):
+                if data[pos:pos + 1] == b"]":
+                    return
+                try:
+                    cycle, end = decoder.raw_decode(text, pos)
+                    yield base + pos, data[pos:end], cycle
+                    pos = end
+                    continue
+                except json.JSONDecodeError as e:
+                    # Decoding a cycle cut by the end of the buffer fails at its end, or on its last string
+                    incomplete = e.msg.startswith("Unterminated string") or len(text) - e.pos <= TOKEN_SIZE
+                    if not incomplete:
+                        raise ValueError(f"Invalid trace: {path}: {e.msg} at byte {base + e.pos}") from None
+                    if eof:
+                        raise ValueError(f"Truncated trace: {path}") from None
+
+            elif eof:
+                raise ValueError(f"Truncated trace: {path}")
+
+            chunk = f.read(CHUNK_SIZE)
+            eof = not chunk
+            base += pos
+            data = data[pos:] + chunk
+            text = data.decode("latin-1")
+            pos = 0
+
+
+def scan_runs(path, cycles):
+    """
+    Yields (offset, raw JSON bytes, number of cycles) for runs of `cycles` consecutive cycles of a trace,
+    without decoding them. A cycle is found by its first key, "ActiveList" (the traces are written with sorted keys),
+    a run ends right before the "{" of the cycle that follows it and the last run ends with the file.
+    Stops at the first cycle that is not in this layout, the rest of the trace must then be read with scan_cycles.
+    """
+    with open_trace(path, "rb") as f:
+        data = b""
+        base = 0 # Offset of the buffer in the file
+        pos = 0 # Where to look for the next cycle
+        found = 0 # Cycles started in the buffer
+        eof = False
+
+        while True:
+            key = data.find(CYCLE_KEY, pos)
+
+            if key < 0:
+                if eof:
+                    if data:
+                        yield base, data, found
+                    return
+                pos = max(pos, len(data) - len(CYCLE_KEY) + 1) # A key cut by the end of the buffer
+                chunk = f.read(CHUNK_SIZE)
+                eof = not chunk
+                data += chunk
+                continue
+
+            start = data.rfind(b"{", 0, key)
+            if start < 0 or data[start + 1:key].strip():
+                return
+            pos = key + len(CYCLE_KEY)
+            found += 1
+
+            if found > cycles:
+                yield base, data[:start], cycles
+                base += start
+                data = data[start:]
+                pos -= start
+                found = 1
+
+
+def decode_run(path, offset, raw):
+    """
+    Returns the parsed cycles of a run yielded by scan_runs
+    """
+    decoder = json.JSONDecoder()
+    text = raw.decode("latin-1")
+    pos = SEPARATORS.match(raw).end()
+    if offset == 0:
+        if raw[pos:pos + 1] != b"[":
+            raise ValueError(f"The trace must be a JSON list: {path}")
+        pos += 1
+
+    cycles = []
+    while True:
+        pos = SEPARATORS.match(raw, pos).end()
+        if pos == len(raw) or raw[pos:pos + 1] == b"]":
+            return cycles
+        try:
+            cycle, pos = decoder.raw_decode(text, pos)
+        except json.JSONDecodeError as e:
+            # A run always ends between two cycles, only the last one can be cut (by the end of the file)
+            if e.msg.startswith("Unterminated string") or len(text) - e.pos <= TOKEN_SIZE:
+                raise ValueError(f"Truncated trace: {path}") from None
+            raise ValueError(f"Invalid trace: {path}: {e.msg} at byte {offset + e.pos}") from None
+        cycles.append(cycle)
+
+
+def iter_raw_cycles(path):
+    """
+    Yields (raw JSON bytes, parsed cycle) for each cycle of a trace, reading the file by chunks
+    """
+    for _, raw, cycle in scan_cycles(path):
+        yield raw, cycle
+
+
+def iter_cycles(path):
+    """
+    Yields the parsed cycles of a trace one at a time
+    """
+    for _, cycle in iter_raw_cycles(path):
+        yield cycle
@@ -0,0 +1,240 @@
+from itertools import compress, count
+from operator import attrgetter, ne
+
+ARRAY_FIELDS = ("BusyBitTable", "PhysicalRegisterFile", "RegisterMapTable")
+SCALAR_FIELDS = ("ActiveList", "DecodedPCs", "Exception", "ExceptionPC", "FreeList", "IntegerQueue", "PC") # Replaced as a whole
+
+# Entries are kept by reference with a copy of the fields that change after dispatch, one column per field:
+# Done and Exception for the Active List, the operand ready flags and tags for the Integer Queue
+# (a value is set once, when its operand becomes ready)
+done = attrgetter("done")
+exception = attrgetter("exception")
+op_a_is_ready = attrgetter("op_a_is_ready")
+op_a_reg_tag = attrgetter("op_a_reg_tag")
+op_b_is_ready = attrgetter("op_b_is_ready")
+op_b_reg_tag = attrgetter("op_b_reg_tag")
+
+
+class TraceRecorder:
+    """
+    Records the processor state of every cycle as keyframes plus deltas.
+    A full copy of the state is stored every `keyframe_interval` cycles,
+    the cycles in between only store the fields that changed
+    (for the fixed-size arrays: only the changed indices).
+    The fields are copied from the ProcessorState (see capture), no JSON is built
+    while recording. Rebuilds the full per-cycle JSON objects on read.
+    """
+
+    def __init__(self, keyframe_interval=64):
+        self.keyframe_interval = keyframe_interval
+        self.keyframes = []
+        self.deltas = [] # One per cycle, None for keyframe cycles
+        self.cycles = [] # state.cycle of each recorded cycle
+        self.previous = None # Own copy of the last recorded state
+
+    def __len__(self):
+        return len(self.deltas)
+
+    def append(self, state):
+        """
+        Records the state at the end of a cycle
+        """
+        fields = capture(state)
+        self.cycles.append(state.cycle)
+
+        if len(self.deltas) % self.keyframe_interval == 0:
+            self.keyframes.append(fields)
+            self.deltas.append(None)
+            self.previous = fields
+            return
+
+        previous = self.previous
+        delta = {}
+
+        for key in SCALAR_FIELDS:
+            value = fields[key]
+            if value != previous[key]:
+                delta[key] = value
+
+        for key in ARRAY_FIELDS:
+            value = fields[key]
+            old = previous[key]
+            if value != old:
+                # Changed indices and their values, found in C (compress, map)
+                changed = tuple(compress(count(), map(ne, value, old)))
+                delta[key] = (changed, tuple(map(value.__getitem__, changed)))
+
+        # The captured fields are own copies, they are the reference of the next delta
+        self.previous = fields
+        self.deltas.append(delta)
+
+    def trim(self, keep):
+        """
+        Drops the oldest keyframes and their deltas as long as at least keep cycles remain,
+        so a bounded window costs at most keep + keyframe_interval cycles
+        """
+        interval = self.keyframe_interval
+        drop = (len(self.deltas) - keep) // interval
+        if drop > 0:
+            del self.keyframes[:drop]
+            del self.deltas[:drop * interval]
+            del self.cycles[:drop * interval]
+
+    def clear(self):
+        self.keyframes.clear()
+        self.deltas.clear()
+        self.cycles.clear()
+        self.previous = None
+
+    def __getitem__(self, index):
+        """
+        Rebuilds the state of a single cycle from its closest keyframe
+        """
+        if index < 0:
+            index += len(self.deltas)
+        if not 0 <= index < len(self.deltas):
+            raise IndexError("trace index out of range")
+
+        start = index - index % self.keyframe_interval
+        frame = self.keyframes[start // self.keyframe_interval]
+        for delta in self.deltas[start + 1:index + 1]:
+            frame = apply_delta(frame, delta)
+        return to_json(frame)
+
+    def __iter__(self):
+        """
+        Yields the full state of every cycle in order
+        """
+        frame = None
+        keyframes = iter(self.keyframes)
+
+        for delta in self.deltas:
+            if delta is None:
+                frame = next(keyframes)
+            else:
+                frame = apply_delta(frame, delta)
+            yield to_json(frame)
+
+
+def capture(state):
+    """
+    Copies the traced fields of a ProcessorState
+    """
+    active_list = state.active_list
+    integer_queue = state.integer_queue
+    return {
+        "ActiveList": (tuple(active_list), tuple(map(done, active_list)), tuple(map(exception, active_list))),
+        "BusyBitTable": list(state.busy_bit_table),
+        "DecodedPCs": tuple(state.decoded_pcs),
+        "Exception": state.exception,
+        "ExceptionPC": state.exception_pc,
+        "FreeList": tuple(state.free_list),
+        "IntegerQueue": (
+            tuple(integer_queue),
+            tuple(map(op_a_is_ready, integer_queue)), tuple(map(op_a_reg_tag, integer_queue)),
+            tuple(map(op_b_is_ready, integer_queue)), tuple(map(op_b_reg_tag, integer_queue))
+        ),
+        "PC": state.pc,
+        "PhysicalRegisterFile": list(state.physical_register_file),
+        "RegisterMapTable": list(state.register_map_table)
+    }
+
+
+def apply_delta(frame, delta):
+    """
+    Returns a new frame with the delta applied, unchanged fields are shared with the given frame
+    """
+    frame = dict(frame)
+
+    for key, value in delta.items():
+        if key in ARRAY_FIELDS:
+            array = list(frame[key])
+            for i, v in zip(*value):
+                array[i] = v
+            frame[key] = array
+        else:
+            frame[key] = value
+
+    return frame
+
+
+def to_json(frame):
+    """
+    Returns a recorded frame in the layout of the trace (see ProcessorState.to_json)
+    """
+    return {
+        "ActiveList": [
+            {
+                "Done": entry_done,
+                "Exception": entry_exception,
+                "LogicalDestination": entry.logical_destination,
+                "OldDestination": entry.old_destination,
+                "PC": entry.pc
+            }
+            for entry, entry_done, entry_exception in zip(*frame["ActiveList"])
+        ],
+        "BusyBitTable": list(frame["BusyBitTable"]),
+        "DecodedPCs": list(frame["DecodedPCs"]),
+        "Exception": frame["Exception"],
+        "ExceptionPC": frame["ExceptionPC"],
+        "FreeList": list(frame["FreeList"]),
+        "IntegerQueue": [
+            {
+                "DestRegister": entry.dest_register,
+                "OpAIsReady": a_ready,
+                "OpARegTag": a_tag,
+                "OpAValue": entry.op_a_value if a_ready else 0,
+                "OpBIsReady": b_ready,
+                "OpBRegTag": b_tag,
+                "OpBValue": entry.op_b_value if b_ready else 0,
+                "OpCode": entry.opcode,
+                "PC": entry.pc
+            }
+            for entry, a_ready, a_tag, b_ready, b_tag in zip(*frame["IntegerQueue"])
+        ],
+        "PC": frame["PC"],
+        "PhysicalRegisterFile": list(frame["PhysicalRegisterFile"]),
+        "RegisterMapTable": list(frame["RegisterMapTable"])
+    }
+
+
+def main():
+    """
+    Records the simulation of a program and checks that the rebuilt cycles, read in order and one at a time,
+    are the cycles of its JSON trace (used by testall.sh)
+    """
+    import argparse
+    import json
+    import os
+    import sys
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from pipeline.stage0 import decode_program
+    from pipeline.state import ProcessorState
+    from simulator import simulate
+    from tracing.trace_reader import iter_cycles
+
+    parser = argparse.ArgumentParser(description="Check the keyframe + delta recorder against a JSON trace")
+    parser.add_argument("input", help="The simulated program.")
+    parser.add_argument("trace", help="Its JSON trace, written by src/simulator.py.")
+    parser.add_argument("--keyframe-interval", type=int, default=8, help="Cycles between two keyframes.")
+    args = parser.parse_args()
+
+    with open(args.input) as f:
+        program = decode_program(json.load(f))
+    recorder = TraceRecorder(args.keyframe_interval)
+    simulate(ProcessorState(), program, recorder)
+
+    expected = list(iter_cycles(args.trace))
+    if len(recorder) != len(expected):
+        sys.exit(f"{len(recorder)} cycles recorded, {len(expected)} in the trace")
+    for i, cycle in enumerate(recorder):
+        if cycle != expected[i]:
+            sys.exit(f"Cycle {i} rebuilt in order differs from the trace")
+        if recorder[i] != expected[i]:
+            sys.exit(f"Cycle {i} rebuilt alone differs from the trace")
+    print(f"{len(recorder)} cycles rebuilt")
+
+
+if __name__ == "__main__":
+    main()
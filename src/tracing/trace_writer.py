@@ -0,0 +1,88 @@
+import gzip
+import json
+import os
+
+from checkpoint import StopSimulation
+
+
+class CycleCounter:
+    """
+    Trace sink that only counts the cycles, for the runs whose trace is not needed
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, state):
+        self.count += 1
+
+
+class TraceWriter:
+    """
+    Streams the trace to a file as a JSON array, one cycle at a time.
+    The pretty mode produces the same bytes as json.dump(trace, f, indent=2).
+    Nothing is kept in memory once a cycle has been written.
+    """
+
+    def __init__(self, path, pretty=True, compress=None):
+        if compress is None:
+            compress = str(path).endswith(".gz")
+
+        self.path = path
+        self.file = gzip.open(path, "wt") if compress else open(path, "w")
+        self.pretty = pretty
+        self.count = 0
+
+        if pretty:
+            self.separator = ",\n  "
+        else:
+            self.separator = ","
+
+    def __len__(self):
+        return self.count
+
+    def append(self, state):
+        """
+        Writes the state at the end of a cycle
+        """
+        self.append_json(state.to_json())
+
+    def append_json(self, cycle):
+        """
+        Writes a cycle already in the layout of the trace
+        """
+        if self.pretty:
+            text = json.dumps(cycle, indent=2).replace("\n", "\n  ")
+        else:
+            text = json.dumps(cycle, separators=(",", ":"))
+
+        if self.count == 0:
+            self.file.write("[\n  " if self.pretty else "[")
+        else:
+            self.file.write(self.separator)
+        self.file.write(text)
+        self.count += 1
+
+    def close(self):
+        """
+        Terminates the JSON array and closes the file
+        """
+        if self.count == 0:
+            self.file.write("[]")
+        else:
+            self.file.write("\n]" if self.pretty else "]")
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None or issubclass(exc_type, StopSimulation):
+            self.close()
+        else:
+            # Do not leave a truncated trace behind
+            self.file.close()
+            os.remove(self.path)
@@ -7,4 +7,90 @@ do
     cat ${tnum}/desc.txt
     printf "\n"
     python ./compare.py ${tnum}/user_output.json -r ${tnum}/output.json
-done
\ No newline at end of file
+done
+
+# The keyframe + delta recorder rebuilds the same cycles as the JSON trace
+for tnum in ./given_tests/*
+do
+    if [ -f ${tnum}/user_output.json ]; then
+        python ./src/tracing/trace_recorder.py ${tnum}/input.json ${tnum}/user_output.json
+    fi
+done
+
+# The kernel engine writes the same traces as the stage functions
+kernel_output=$(mktemp)
+for tnum in ./given_tests/*
+do
+    if [ -f ${tnum}/output.json ]; then
+        cat ${tnum}/desc.txt
+        printf " (--engine kernel)\n"
+        python ./src/simulator.py ${tnum}/input.json ${kernel_output} --engine kernel
+        python ./compare.py ${kernel_output} -r ${tnum}/output.json
+    fi
+done
+rm -f ${kernel_output}
+
+# A simulation resumed from a checkpoint taken with --timeline records the timeline of the full run,
+# a checkpoint taken without it is rejected
+resume_dir=$(mktemp -d)
+for tnum in ./given_tests/*
+do
+    if [ -f ${tnum}/output.json ]; then
+        python ./src/simulator.py ${tnum}/input.json ${resume_dir}/full.json --timeline ${resume_dir}/full_timeline.json
+        python ./src/simulator.py ${tnum}/input.json ${resume_dir}/start.json --checkpoint ${resume_dir}/timeline.ckpt --checkpoint-at 2 --stop --timeline ${resume_dir}/unused.json
+        python ./src/simulator.py ${tnum}/input.json ${resume_dir}/rest.json --resume ${resume_dir}/timeline.ckpt --timeline ${resume_dir}/resumed_timeline.json
+        python ./src/simulator.py ${tnum}/input.json ${resume_dir}/start.json --checkpoint ${resume_dir}/plain.ckpt --checkpoint-at 2 --stop
+        if ! cmp -s ${resume_dir}/full_timeline.json ${resume_dir}/resumed_timeline.json; then
+            printf "${tnum}: the resumed timeline differs from the full run\n"
+        else
+            # parser.error exits with 2, a crash with 1
+            python ./src/simulator.py ${tnum}/input.json ${resume_dir}/rest.json --resume ${resume_dir}/plain.ckpt --timeline ${resume_dir}/resumed_timeline.json 2>/dev/null
+            if [ $? -ne 2 ]; then
+                printf "${tnum}: --timeline did not reject a checkpoint taken without it\n"
+            else
+                printf "${tnum}: resumed timeline PASSED\n"
+            fi
+        fi
+    fi
+done
+rm -rf ${resume_dir}
+
+# batch.py fails the run when a test with an output.json ends in ERROR (its worker raised),
+# not when an invalid program without an output.json is rejected
+batch_dir=$(mktemp -d)
+mkdir ${batch_dir}/raises ${batch_dir}/rejected
+printf '["adu x2, x3, 5"]\n' > ${batch_dir}/raises/input.json
+cp ./given_tests/01/output.json ${batch_dir}/raises/output.json
+printf '["adu x2, x3, 5"]\n' > ${batch_dir}/rejected/input.json
+python ./batch.py ${batch_dir} --no-cache --jobs 1 > /dev/null
+if [ $? -ne 1 ]; then
+    printf "batch.py: an ERROR on a test with an output.json did not fail the run\n"
+else
+    rm -rf ${batch_dir}/raises
+    python ./batch.py ${batch_dir} --no-cache --jobs 1 > /dev/null
+    if [ $? -ne 0 ]; then
+        printf "batch.py: a rejected invalid program without an output.json failed the run\n"
+    else
+        printf "batch.py: exit status PASSED\n"
+    fi
+fi
+rm -rf ${batch_dir}
+
+# --stop keeps the trace up to the checkpointed cycle, a --checkpoint-at cycle past the end is rejected
+checkpoint_dir=$(mktemp -d)
+for tnum in ./given_tests/*
+do
+    if [ -f ${tnum}/output.json ]; then
+        python ./src/simulator.py ${tnum}/input.json ${checkpoint_dir}/start.json --checkpoint ${checkpoint_dir}/state.ckpt --checkpoint-at 2 --stop
+        python ./src/simulator.py ${tnum}/input.json ${checkpoint_dir}/full.json --checkpoint ${checkpoint_dir}/late.ckpt --checkpoint-at 100000 2>/dev/null
+        status=$?
+        if ! python -c "import json, sys; sys.exit(len(json.load(open(sys.argv[1]))) != 3)" ${checkpoint_dir}/start.json 2>/dev/null; then
+            printf "${tnum}: --stop did not keep the trace up to the checkpointed cycle\n"
+        elif [ ${status} -ne 2 ] || [ -f ${checkpoint_dir}/late.ckpt ]; then
+            printf "${tnum}: a --checkpoint-at cycle past the end was not rejected\n"
+        else
+            printf "${tnum}: checkpoint PASSED\n"
+        fi
+    fi
+done
+rm -rf ${checkpoint_dir}
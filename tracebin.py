@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+from tracing.binary_trace import BinaryTrace, BinaryTraceWriter
+from tracing.trace_reader import iter_cycles
+from tracing.trace_writer import TraceWriter
+
+
+def toBinary(INPUT, OUTPUT):
+    '''
+    Converts a JSON trace (plain or gzip) to the binary format, one cycle at a time
+    '''
+    cycles = iter_cycles(INPUT)
+    first = next(cycles, None)
+    if first is None:
+        raise ValueError(f"Empty trace: {INPUT}")
+
+    with BinaryTraceWriter(OUTPUT, len(first["PhysicalRegisterFile"]), len(first["RegisterMapTable"])) as writer:
+        writer.append_json(first)
+        for cycle in cycles:
+            writer.append_json(cycle)
+    return len(writer)
+
+
+def toJson(INPUT, OUTPUT, pretty=True, compress=None):
+    '''
+    Converts a binary trace back to the JSON trace compare.py reads
+    '''
+    with BinaryTrace(INPUT) as trace, TraceWriter(OUTPUT, pretty, compress) as writer:
+        for cycle in trace:
+            writer.append_json(cycle)
+    return len(writer)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Converts traces between the JSON and the binary columnar formats.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    binary = subparsers.add_parser("to-binary", help="JSON trace to binary trace.")
+    binary.add_argument("input")
+    binary.add_argument("output")
+
+    text = subparsers.add_parser("to-json", help="Binary trace to JSON trace.")
+    text.add_argument("input")
+    text.add_argument("output")
+    text.add_argument("--compact", action="store_true", help="Write the trace without indentation.")
+    text.add_argument("--gzip", action="store_true", default=None, help="Compress the trace (default for .gz outputs).")
+
+    show = subparsers.add_parser("show", help="Print the cycles of a binary trace.")
+    show.add_argument("input")
+    show.add_argument("cycles", type=int, nargs="*", help="The cycles to print (all by default).")
+
+    args = parser.parse_args()
+
+    if args.command == "to-binary":
+        print(f"{toBinary(args.input, args.output)} cycles written")
+    elif args.command == "to-json":
+        print(f"{toJson(args.input, args.output, not args.compact, args.gzip)} cycles written")
+    else:
+        with BinaryTrace(args.input) as trace:
+            for i in args.cycles or range(len(trace)):
+                print(json.dumps(trace[i], indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import json
+import os
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from result_cache import DEFAULT_DIRECTORY
+from tracing.binary_trace import BinaryTrace, is_binary_trace
+from tracing.trace_index import IndexedTrace
+
+VISUALIZER = os.path.join(ROOT, "visualize.html")
+MAX_PAGE = 1024 # cycles per request
+
+
+def openTrace(PATH, INDEX_DIR):
+    '''
+    Opens a trace for random access: binary traces are read in place,
+    JSON traces are indexed once (the index is kept in INDEX_DIR until the trace changes)
+    '''
+    if is_binary_trace(PATH):
+        return BinaryTrace(PATH)
+
+    name = hashlib.sha256(os.path.abspath(PATH).encode()).hexdigest()
+    return IndexedTrace(PATH, os.path.join(INDEX_DIR, "index", name + ".idx"))
+
+
+def readCycles(trace, start, count):
+    '''
+    Returns cycles start to start + count - 1 as the bytes of a JSON list
+    '''
+    if isinstance(trace, IndexedTrace):
+        return trace.raw(start, count)
+    end = min(start + count, len(trace))
+    if not 0 <= start < end:
+        raise IndexError("cycle out of range")
+    return json.dumps([trace[i] for i in range(start, end)]).encode()
+
+
+class TraceHandler(BaseHTTPRequestHandler):
+    '''
+    - GET /: the visualizer, which pages the cycles from this server
+    - GET /info: {"cycles": number of cycles, "name": trace file name}
+    - GET /cycles?start=i&count=n: JSON list of cycles i to i + n - 1 (at most MAX_PAGE)
+    - GET /cycles/i: cycle i
+    '''
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        trace = self.server.trace
+
+        try:
+            if url.path in ("/", "/visualize.html"):
+                with open(VISUALIZER, "rb") as f:
+                    self.reply(200, "text/html; charset=utf-8", f.read())
+            elif url.path == "/info":
+                info = {"cycles": len(trace), "name": os.path.basename(self.server.path)}
+                self.reply(200, "application/json", json.dumps(info).encode())
+            elif url.path == "/cycles":
+                start = int(query.get("start", 0))
+                count = min(int(query.get("count", 1)), MAX_PAGE)
+                self.reply(200, "application/json", readCycles(trace, start, count))
+            elif url.path.startswith("/cycles/"):
+                cycle = readCycles(trace, int(url.path[len("/cycles/"):]), 1)
+                self.reply(200, "application/json", cycle[1:-1])
+            else:
+                self.error(404, f"Unknown path: {url.path}")
+        except ValueError:
+            self.error(400, "Cycle numbers must be integers")
+        except IndexError as e:
+            self.error(404, str(e))
+
+    def reply(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def error(self, status, message):
+        self.reply(status, "application/json", json.dumps({"error": message}).encode())
+
+    def log_message(self, format, *args):
+        pass # One line per page would flood the terminal while scrubbing
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serves the cycles of a trace on demand to visualize.html, for traces too large to load at once")
+    parser.add_argument("trace", help="JSON trace (plain or gzip) or binary trace.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8471)
+    parser.add_argument("--index-dir", default=DEFAULT_DIRECTORY, help="Directory keeping the cycle index of JSON traces.")
+    args = parser.parse_args()
+
+    print(f"Indexing {args.trace}...")
+    with openTrace(args.trace, args.index_dir) as trace:
+        server = ThreadingHTTPServer((args.host, args.port), TraceHandler)
+        server.trace = trace
+        server.path = args.trace
+        print(f"{len(trace)} cycles, open http://{args.host}:{args.port}/")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+
+if __name__ == "__main__":
+    main()